@@ -3,20 +3,396 @@ Booking Agent for handling accommodation booking requests
 Uses SerpApi Google Hotels API to find and suggest accommodations
 """
 import os
+import time
+import logging
+import asyncio
+import httpx
 import requests
-import json
 import re
+import heapq
+import orjson
+import redis
+from functools import lru_cache
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 from crewai import Agent, Task
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Any, Optional, Dict, List
-from langchain_openai import ChatOpenAI
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from dotenv import load_dotenv
-from core.utils import detect_destination, detect_time, extract_preferences, detect_trip_length
+from core.utils import detect_destination, detect_time, extract_preferences, detect_trip_length, VIETNAMESE_DESTINATIONS
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# SerpApi key, read once for every SerpApiHotelsTool instance
+_SERPAPI_KEY = os.getenv('SERPAPI_KEY')
+if not _SERPAPI_KEY:
+    logger.warning("No SerpApi key found. Please set SERPAPI_KEY environment variable. Hotel search will fallback to static recommendations.")
+
+def _build_session() -> requests.Session:
+    """Keep-alive SerpApi session with retries on transient HTTP errors"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    # Advertise every codec urllib3 can decode here (gzip, deflate, and br
+    # when brotli is installed) so SerpApi payloads are compressed on the wire
+    session.headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+    return session
+
+
+# One connection pool for all SerpApiHotelsTool instances, so DNS + TCP + TLS
+# setup is paid once per process rather than once per tool or per call
+_SESSION = _build_session()
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    """HTTP/2 SerpApi client for one async call or batch; callers close it with async with"""
+    # An AsyncClient is bound to the event loop it first runs on, so it is
+    # never shared across calls that may run on different loops
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(_SERPAPI_TIMEOUT[1], connect=_SERPAPI_TIMEOUT[0]),
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+    )
+
+# Formatted SerpApi results keyed by normalized search parameters; hotel
+# rates move on a minutes-to-hours scale so repeats within 15 minutes reuse them
+_HOTEL_CACHE = TTLCache(maxsize=512, ttl=900)
+_HOTEL_CACHE_LOCK = Lock()
+
+# Seconds a formatted SerpApi result stays in the shared Redis tier
+_REDIS_TTL = 300
+
+
+def _build_redis() -> Optional[redis.Redis]:
+    """Redis client shared across processes, or None when REDIS_URL is unset"""
+    url = os.getenv('REDIS_URL')
+    if not url:
+        return None
+    # Short timeouts: a slow or unreachable Redis must not delay the live search
+    return redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+
+# Second cache tier behind _HOTEL_CACHE, so worker processes (e.g. Gradio
+# replicas) reuse each other's searches instead of each paying for SerpApi
+_REDIS = _build_redis()
+
+
+def _redis_key(cache_key: tuple) -> str:
+    """Redis key for a normalized hotel search"""
+    return "gh:" + ":".join(map(str, cache_key))
+
+
+def _cache_get(cache_key: tuple) -> Optional[str]:
+    """Cached formatted results, checking the local tier before Redis"""
+    with _HOTEL_CACHE_LOCK:
+        cached = _HOTEL_CACHE.get(cache_key)
+    if cached is not None or _REDIS is None:
+        return cached
+    
+    try:
+        raw = _REDIS.get(_redis_key(cache_key))
+    except redis.RedisError as e:
+        logger.warning("⚠️ Redis cache unavailable: %s", e)
+        return None
+    if raw is None:
+        return None
+    
+    cached = raw.decode('utf-8')
+    with _HOTEL_CACHE_LOCK:
+        _HOTEL_CACHE[cache_key] = cached
+    return cached
+
+
+def _cache_put(cache_key: tuple, result: str) -> None:
+    """Store formatted results in both cache tiers"""
+    with _HOTEL_CACHE_LOCK:
+        _HOTEL_CACHE[cache_key] = result
+    if _REDIS is None:
+        return
+    
+    try:
+        _REDIS.setex(_redis_key(cache_key), _REDIS_TTL, result)
+    except redis.RedisError as e:
+        logger.warning("⚠️ Redis cache unavailable: %s", e)
+
+# Static SerpApiHotelsTool fallback recommendations by destination and budget
+_FALLBACK_RECS = {
+    "hanoi": {
+        "luxury": (
+            "Lotte Hotel Hanoi - Đẳng cấp quốc tế 5 sao",
+            "InterContinental Hanoi Westlake - View Hồ Tây tuyệt đẹp",
+            "Hotel Metropole Hanoi - Lịch sử và sang trọng"
+        ),
+        "mid_range": (
+            "Silk Path Hotel - Vị trí trung tâm thuận tiện",
+            "Golden Silk Boutique Hotel - Phong cách boutique",
+            "La Siesta Hoi An Resort & Spa - Dịch vụ tuyệt vời"
+        ),
+        "budget": (
+            "May De Ville Old Quarter - Giá tốt ở phố cổ",
+            "Hanoi La Siesta Hotel & Spa - Tầm trung chất lượng",
+            "Golden Legend Hotel - Gần các điểm tham quan"
+        )
+    },
+    "saigon": {
+        "luxury": (
+            "Park Hyatt Saigon - Luxury tại trung tâm",
+            "The Reverie Saigon - Xa hoa và đẳng cấp",
+            "Hotel Majestic Saigon - Lịch sử và view sông"
+        ),
+        "mid_range": (
+            "Liberty Central Saigon Riverside - View sông đẹp",
+            "Silverland Jolie Hotel & Spa - Boutique hiện đại",
+            "Hotel Royal Saigon - Trung tâm thành phố"
+        ),
+        "budget": (
+            "Mai House Saigon - Hostel chất lượng cao",
+            "Saigon Backpackers - Gặp gỡ du khách quốc tế",
+            "Liberty Central Saigon Centre - Tầm trung tốt"
+        )
+    },
+    "danang": {
+        "luxury": (
+            "InterContinental Danang Sun Peninsula Resort - Resort đẳng cấp",
+            "Pullman Danang Beach Resort - Bãi biển riêng",
+            "Hyatt Regency Danang Resort and Spa - Spa world-class"
+        ),
+        "mid_range": (
+            "Novotel Danang Premier Han River - View sông Hàn",
+            "Muong Thanh Luxury Danang - Gần bãi biển",
+            "Danang Golden Bay - Thiết kế độc đáo"
+        ),
+        "budget": (
+            "Danang Backpackers - Hostel gần biển",
+            "Memory Hostel - Clean và an toàn",
+            "Okay Boutique Hotel - Tầm trung giá tốt"
+        )
+    }
+}
+
+# Static footer appended to every SerpApi hotel listing
+_BOOKING_GUIDANCE = """
+
+💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
+• Các giá trên có thể thay đổi theo thời gian thực
+• Nên đặt phòng trước 1-2 tuần để có giá tốt
+• Kiểm tra chính sách hủy phòng trước khi đặt
+• Liên hệ trực tiếp khách sạn để có giá tốt nhất
+
+📞 **Platform đề xuất:** Booking.com, Agoda, Traveloka
+"""
+
+# One SerpApiHotelsTool hotel entry, filled from _extract_hotel_info
+_RESULT_TMPL = (
+    "\n{i}. **{name}** ⭐{rating}/5.0\n"
+    "   📍 Địa chỉ: {address}\n"
+    "   💰 Giá phòng: {price}\n"
+    "   🏆 Đánh giá: {reviews}\n"
+    "   🏨 Tiện nghi: {amenities}\n"
+    "   📝 Ghi chú: {notes}\n"
+)
+
+# Default recommendations for destinations missing from _FALLBACK_RECS
+_DEFAULT_RECS = {
+    "luxury": (
+        "Khách sạn 4-5 sao địa phương - Dịch vụ cao cấp",
+        "Resort nghỉ dưỡng - Không gian yên tĩnh",
+        "Boutique hotel - Phong cách độc đáo"
+    ),
+    "mid_range": (
+        "Khách sạn 3-4 sao - Vị trí thuận tiện",
+        "Hotel boutique - Dịch vụ tốt, giá hợp lý",
+        "Khách sạn trung tâm - Gần điểm tham quan"
+    ),
+    "budget": (
+        "Hostel chất lượng cao - Gặp gỡ bạn bè mới",
+        "Nhà nghỉ sạch sẽ - Tiết kiệm chi phí",
+        "Hotel mini - Đầy đủ tiện nghi cơ bản"
+    )
+}
+
+_FALLBACK_DEST_KEYS = tuple(_FALLBACK_RECS.keys())
+
+# Spellings of each _FALLBACK_RECS destination, mapped to its key: the key
+# itself plus the VIETNAMESE_DESTINATIONS name and aliases that include it
+_FALLBACK_ALIASES = {key: key for key in _FALLBACK_DEST_KEYS}
+for _canonical, _aliases in VIETNAMESE_DESTINATIONS.items():
+    for _key in _FALLBACK_DEST_KEYS:
+        if _key == _canonical or _key in _aliases:
+            for _alias in (_canonical, *_aliases):
+                _FALLBACK_ALIASES.setdefault(_alias, _key)
+
+# One scan of a destination for every alias; longer aliases are tried first
+_FALLBACK_ALIAS_RE = re.compile(
+    "|".join(map(re.escape, sorted(_FALLBACK_ALIASES, key=len, reverse=True)))
+)
+
+# (connect, read) timeout for SerpApi calls: fail fast on an unreachable host
+# while still allowing the slower Google Hotels search itself to finish
+_SERPAPI_TIMEOUT = (3, 30)
+
+# Upper bound (seconds) on how long SerpApiHotelsTool stops calling a failing API
+_MAX_BACKOFF = 60
+
+# Most SerpApi searches a batch runs at once, to stay under provider rate limits
+_BATCH_CONCURRENCY = 8
+
+# Minimum rating a SerpApi hotel needs for each budget range
+_MIN_RATING = {"luxury": 4.0, "mid_range": 3.5, "budget": 3.0}
+
+# Fallback key orders for the loosely structured SerpApi hotel records
+_RATING_KEYS = ("overall_rating", "rating")
+_LOC_KEYS = ("neighborhood", "district")
+
+
+def _first_present(record: Dict, keys: tuple, default: Any = None) -> Any:
+    """Value of the first key in keys that is set (truthy) in record"""
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return value
+    return default
+
+
+def _rating(hotel: Dict) -> float:
+    """Rating used to filter and rank SerpApi hotels"""
+    return _first_present(hotel, _RATING_KEYS, 0)
+
+
+@lru_cache(maxsize=256)
+def _fallback_recommendations(destination: str, budget_range: str, adults: int, children: int) -> str:
+    """Static fallback listing; memoized since it only depends on its arguments"""
+    guest_info = f"{adults} người lớn"
+    if children > 0:
+        guest_info += f", {children} trẻ em"
+
+    # Find matching destination: a known spelling inside it, else a key
+    # that contains it
+    destination_lower = destination.lower()
+    match = _FALLBACK_ALIAS_RE.search(destination_lower)
+    if match:
+        dest_key = _FALLBACK_ALIASES[match.group()]
+    else:
+        dest_key = next((key for key in _FALLBACK_DEST_KEYS if destination_lower in key), None)
+
+    # Get recommendations
+    if dest_key:
+        recs = _FALLBACK_RECS[dest_key].get(budget_range, _DEFAULT_RECS[budget_range])
+    else:
+        recs = _DEFAULT_RECS[budget_range]
+
+    # Format response in one pass, each entry on its own line
+    recs_block = "".join(f"\n{i}. **{rec}**" for i, rec in enumerate(recs, 1))
+
+    return f"""
+🏨 **GỢI Ý KHÁCH SẠN TẠI {destination.upper()}**
+👥 Cho {guest_info} | 💰 Phân khúc: {budget_range}
+
+⚠️ *Thông tin từ cơ sở dữ liệu địa phương (API tạm thời không khả dụng)*
+
+{recs_block}
+
+💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
+• Kiểm tra giá và tình trạng phòng trực tiếp
+• Đặt phòng qua các platform: Booking.com, Agoda, Traveloka
+• Liên hệ trực tiếp khách sạn để có giá tốt nhất
+• Đọc review và chính sách hủy phòng
+
+📍 **Lưu ý:** Giá có thể thay đổi theo mùa và sự kiện đặc biệt tại {destination}
+"""
+
+
+def _booking_task_desc(relevant_history: str, request: str, destination: str, check_in: str,
+                       check_out: str, guest_count: int, guest_note: str, budget: str) -> str:
+    """Task description for BookingAgent.create_task"""
+    return f"""
+            Dựa vào lịch sử trò chuyện sau:
+            ---
+            {relevant_history}
+            ---
+            
+            Yêu cầu của khách: "{request}"
+            
+            Thông tin đã trích xuất:
+            - Điểm đến: {destination}
+            - Ngày nhận phòng: {check_in}
+            - Ngày trả phòng: {check_out}
+            - Số khách: {guest_count} người ({guest_note})
+            - Ngân sách: {budget}
+
+            Nhiệm vụ:
+            1. **BẮT BUỘC: Sử dụng tool `hotel_search`** để tìm khách sạn phù hợp tại {destination}.
+               - Tham số tìm kiếm:
+                 * destination: "{destination}"
+                 * check_in_date: "{check_in}"
+                 * check_out_date: "{check_out}"
+                 * number_of_guests: {guest_count}
+                 * budget_range: "{budget}"
+               - Nếu khách cần phòng ở nhiều điểm đến, gọi `hotel_search_batch` một lần với tất cả các điểm đến thay vì gọi `hotel_search` nhiều lần.
+            
+            2. **Phân tích sở thích lưu trú từ yêu cầu và lịch sử trò chuyện:**
+               - Loại hình: resort, khách sạn, homestay, hostel
+               - Tiện nghi: hồ bơi, gần biển, view đẹp, bữa sáng
+               - Vị trí: trung tâm, gần sân bay, yên tĩnh
+            
+            3. **Đề xuất tối đa 5 khách sạn phù hợp nhất** dựa trên:
+               - Độ phù hợp với sở thích đã phân tích
+               - Vị trí thuận tiện cho du lịch
+               - Tiện nghi và dịch vụ
+               - Đánh giá từ khách hàng
+               - Giá cả trong ngân sách
+            
+            4. **Thông tin chi tiết cho mỗi khách sạn:**
+               - Tên và địa chỉ
+               - Giá phòng cho {guest_count} người
+               - Điểm đánh giá và nhận xét
+               - Tiện nghi nổi bật
+               - Lưu ý đặc biệt (gần sân bay, view đẹp, v.v.)
+            
+            5. **Lời khuyên đặt phòng:**
+               - Các trang web/app đặt phòng tốt nhất
+               - Thời điểm đặt phòng để có giá tốt
+               - Điều cần lưu ý khi đặt phòng tại {destination}
+            
+            **Định dạng trả lời:**
+            📋 **THÔNG TIN TÌM KIẾM:**
+            - Điểm đến: {destination}
+            - Ngày: {check_in} đến {check_out}
+            - Số khách: {guest_count} người
+            - Ngân sách: {budget}
+            
+            🏨 **KHÁCH SẠN ĐỀ XUẤT:**
+            
+            1. **[Tên khách sạn]**
+               - 📍 Địa chỉ: [Địa chỉ cụ thể]
+               - 💰 Giá phòng: [Khoảng giá/đêm]
+               - ⭐ Đánh giá: [X.X/5.0 - Nhận xét tóm tắt]
+               - 🏊 Tiện nghi: [Danh sách tiện nghi]
+               - 📝 Ghi chú: [Lưu ý đặc biệt]
+            
+            [Tiếp tục cho 4 khách sạn khác...]
+            
+            💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
+            - [Lời khuyên cụ thể cho {destination}]
+            - [Platform đặt phòng được đề xuất]
+            - [Thời điểm tốt nhất để đặt]
+            - [Điều cần chú ý]
+
+            Trả lời bằng tiếng Việt, chi tiết và thực tế. Nếu tool tìm kiếm không hoạt động, hãy sử dụng kiến thức để đưa ra gợi ý khách sạn phù hợp với ngân sách và khu vực.
+        """
+
 
 class HotelSearchInput(BaseModel):
     destination: str = Field(..., description="Destination city or area")
@@ -27,6 +403,10 @@ class HotelSearchInput(BaseModel):
     budget_range: str = Field(default="mid_range", description="Budget range: budget, mid_range, luxury")
 
 
+class HotelBatchSearchInput(BaseModel):
+    queries: List[HotelSearchInput] = Field(..., description="One hotel search per destination/date range")
+
+
 class HotelDetailInput(BaseModel):
     hotel_id: str = Field(..., description="Hotel ID to get details for")
 
@@ -41,10 +421,17 @@ class SerpApiHotelsTool(BaseTool):
     
     def __init__(self, **data: Any):
         super().__init__(**data)
-        self.api_key = os.getenv('SERPAPI_KEY')
-        if not self.api_key:
-            print("Warning: No SerpApi key found. Please set SERPAPI_KEY environment variable.")
-            print("Hotel search will fallback to static recommendations.")
+        self.api_key = _SERPAPI_KEY
+        
+        # Circuit breaker: after a timeout, 429 or 5xx, skip SerpApi until
+        # _next_retry_at, doubling the pause for each consecutive failure
+        self._next_retry_at = 0.0
+        self._consec_fail = 0
+        # hotel_search_batch runs _run from several threads at once
+        self._breaker_lock = Lock()
+        
+        # Keep-alive pool shared by every tool instance
+        self._session = _SESSION
     
     def _run(self, destination: str, check_in_date: str, check_out_date: str, 
              adults: int = 2, children: int = 0, budget_range: str = "mid_range") -> str:
@@ -53,54 +440,172 @@ class SerpApiHotelsTool(BaseTool):
         if not self.api_key:
             return self._get_fallback_recommendations(destination, budget_range, adults, children)
         
+        cache_key = (destination.lower().strip(), check_in_date, check_out_date, adults, children, budget_range)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.info("⚡ Using cached hotel results for %s", destination)
+            return cached
+        
+        if self._circuit_open():
+            logger.warning("🔌 SerpApi backing off after recent failures, using fallback")
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        
         try:
-            # Construct SerpApi request parameters
-            params = {
-                "engine": "google_hotels",
-                "q": destination,
-                "check_in_date": check_in_date,
-                "check_out_date": check_out_date,
-                "adults": adults,
-                "children": children,
-                "currency": "VND",
-                "gl": "vn",  # Country for Vietnam
-                "hl": "vi",  # Language Vietnamese
-                "api_key": self.api_key
-            }
-            
-            # Add hotel class filter based on budget
-            if budget_range == "luxury":
-                params["hotel_class"] = "4,5"
-            elif budget_range == "budget":
-                params["hotel_class"] = "1,2,3"
-            else:  # mid_range
-                params["hotel_class"] = "2,3,4"
-            
-            print(f"🔍 Searching hotels via SerpApi for {destination}")
-            print(f"   📅 {check_in_date} → {check_out_date}")
-            print(f"   👥 {adults} adults, {children} children")
-            print(f"   💰 Budget: {budget_range}")
+            params = self._build_search_params(destination, check_in_date, check_out_date,
+                                               adults, children, budget_range)
             
             # Make API request
-            response = requests.get("https://serpapi.com/search", params=params, timeout=30)
+            response = self._session.get("https://serpapi.com/search", params=params, timeout=_SERPAPI_TIMEOUT)
             
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_hotel_results(data, destination, budget_range, adults, children)
-            else:
-                print(f"❌ SerpApi error: HTTP {response.status_code}")
-                return self._get_fallback_recommendations(destination, budget_range, adults, children)
+            return self._handle_search_response(response.status_code, response.content, cache_key,
+                                                destination, budget_range, adults, children)
                 
         except requests.exceptions.Timeout:
-            print("⏰ SerpApi request timeout")
+            logger.warning("⏰ SerpApi request timeout")
+            self._record_failure()
             return self._get_fallback_recommendations(destination, budget_range, adults, children)
         except requests.exceptions.RequestException as e:
-            print("🌐 Network error: {e}")
+            # Also raised once the adapter's 429/5xx retries are exhausted
+            logger.warning("🌐 Network error: %s", e)
+            self._record_failure()
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        except Exception as e:
+            logger.exception("❌ Unexpected error in hotel search: %s", e)
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+    
+    async def _arun(self, destination: str, check_in_date: str, check_out_date: str, 
+                    adults: int = 2, children: int = 0, budget_range: str = "mid_range") -> str:
+        """Async hotel search on a client scoped to this call"""
+        async with _build_async_client() as client:
+            return await self._asearch(client, destination, check_in_date, check_out_date,
+                                       adults, children, budget_range)
+    
+    async def _asearch(self, client: httpx.AsyncClient, destination: str, check_in_date: str,
+                       check_out_date: str, adults: int = 2, children: int = 0,
+                       budget_range: str = "mid_range") -> str:
+        """Search for hotels over the given async client"""
+        
+        if not self.api_key:
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        
+        cache_key = (destination.lower().strip(), check_in_date, check_out_date, adults, children, budget_range)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.info("⚡ Using cached hotel results for %s", destination)
+            return cached
+        
+        if self._circuit_open():
+            logger.warning("🔌 SerpApi backing off after recent failures, using fallback")
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        
+        try:
+            params = self._build_search_params(destination, check_in_date, check_out_date,
+                                               adults, children, budget_range)
+            
+            response = await client.get("https://serpapi.com/search", params=params)
+            
+            return self._handle_search_response(response.status_code, response.content, cache_key,
+                                                destination, budget_range, adults, children)
+                
+        except httpx.TimeoutException:
+            logger.warning("⏰ SerpApi request timeout")
+            self._record_failure()
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        except httpx.HTTPError as e:
+            logger.warning("🌐 Network error: %s", e)
+            self._record_failure()
             return self._get_fallback_recommendations(destination, budget_range, adults, children)
         except Exception as e:
-            print(f"❌ Unexpected error in hotel search: {e}")
+            logger.exception("❌ Unexpected error in hotel search: %s", e)
             return self._get_fallback_recommendations(destination, budget_range, adults, children)
     
+    async def _arun_batch(self, queries: List[HotelSearchInput]) -> List[str]:
+        """Run several searches concurrently, at most _BATCH_CONCURRENCY at a time"""
+        semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+        
+        # One client for the whole batch, so the searches multiplex over a
+        # single HTTP/2 connection and it is closed before the loop ends
+        async with _build_async_client() as client:
+            async def search(query: HotelSearchInput) -> str:
+                async with semaphore:
+                    return await self._asearch(client, **query.model_dump())
+            
+            return await asyncio.gather(*(search(q) for q in queries))
+    
+    def _circuit_open(self) -> bool:
+        """True while SerpApi calls are paused after consecutive failures"""
+        return time.monotonic() < self._next_retry_at
+    
+    def _record_failure(self) -> None:
+        """Open the circuit with exponential backoff capped at _MAX_BACKOFF"""
+        with self._breaker_lock:
+            self._consec_fail += 1
+            failures = self._consec_fail
+            delay = min(_MAX_BACKOFF, 2 ** failures)
+            self._next_retry_at = time.monotonic() + delay
+        logger.warning("🔌 Pausing SerpApi calls for %ss (%d consecutive failures)", delay, failures)
+    
+    def _record_success(self) -> None:
+        """Reset the consecutive failure count after a successful response"""
+        with self._breaker_lock:
+            self._consec_fail = 0
+    
+    def _build_search_params(self, destination: str, check_in_date: str, check_out_date: str,
+                             adults: int, children: int, budget_range: str) -> Dict[str, Any]:
+        """Construct SerpApi request parameters"""
+        params = {
+            "engine": "google_hotels",
+            "q": destination,
+            "check_in_date": check_in_date,
+            "check_out_date": check_out_date,
+            "adults": adults,
+            "children": children,
+            "currency": "VND",
+            "gl": "vn",  # Country for Vietnam
+            "hl": "vi",  # Language Vietnamese
+            "num": 10,  # Only the top 5 are shown; don't pull the full result page
+            "api_key": self.api_key
+        }
+        
+        # Add hotel class filter based on budget
+        if budget_range == "luxury":
+            params["hotel_class"] = "4,5"
+        elif budget_range == "budget":
+            params["hotel_class"] = "1,2,3"
+        else:  # mid_range
+            params["hotel_class"] = "2,3,4"
+        
+        logger.info("🔍 Searching hotels via SerpApi for %s (%s → %s, %d adults, %d children, budget: %s)",
+                    destination, check_in_date, check_out_date, adults, children, budget_range)
+        
+        return params
+    
+    def _handle_search_response(self, status_code: int, body: bytes, cache_key: tuple,
+                                destination: str, budget_range: str, adults: int, children: int) -> str:
+        """Turn a raw SerpApi response into formatted results, caching successes"""
+        if status_code != 200:
+            logger.warning("❌ SerpApi error: HTTP %s", status_code)
+            if status_code == 429 or status_code >= 500:
+                self._record_failure()
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        
+        self._record_success()
+        
+        # Cheap byte scan before decoding: error payloads and empty
+        # result sets never need the full JSON parse
+        if b'"error"' in body or b'"properties"' not in body:
+            logger.info("📍 SerpApi returned no hotel properties")
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            logger.warning("❌ Invalid SerpApi JSON payload: %s", e)
+            return self._get_fallback_recommendations(destination, budget_range, adults, children)
+        result = self._format_hotel_results(data, destination, budget_range, adults, children)
+        _cache_put(cache_key, result)
+        return result
+    
     def _format_hotel_results(self, data: Dict, destination: str, budget_range: str, 
                             adults: int, children: int) -> str:
         """Format hotel search results from SerpApi response"""
@@ -108,58 +613,39 @@ class SerpApiHotelsTool(BaseTool):
             hotels = data.get("properties", [])
             
             if not hotels:
-                print("📍 No hotels found in API response")
+                logger.info("📍 No hotels found in API response")
                 return self._get_fallback_recommendations(destination, budget_range, adults, children)
             
-            # Filter and sort hotels
-            filtered_hotels = self._filter_by_budget(hotels, budget_range)
-            
-            # Limit to top 5 results
-            top_hotels = filtered_hotels[:5]
+            # Filter and rank hotels, keeping the top 5
+            top_hotels = self._filter_by_budget(hotels, budget_range)
             
             if not top_hotels:
-                print("🔍 No hotels match the budget criteria")
+                logger.info("🔍 No hotels match the budget criteria")
                 return self._get_fallback_recommendations(destination, budget_range, adults, children)
             
-            # Format results
-            formatted_results = []
-            for i, hotel in enumerate(top_hotels, 1):
-                hotel_info = self._extract_hotel_info(hotel)
-                
-                formatted_hotel = f"""
-{i}. **{hotel_info['name']}** ⭐{hotel_info['rating']}/5.0
-   📍 Địa chỉ: {hotel_info['address']}
-   💰 Giá phòng: {hotel_info['price']}
-   🏆 Đánh giá: {hotel_info['reviews']}
-   🏨 Tiện nghi: {hotel_info['amenities']}
-   📝 Ghi chú: {hotel_info['notes']}
-"""
-                formatted_results.append(formatted_hotel)
+            # Format results from the shared entry template
+            formatted_results = [
+                _RESULT_TMPL.format(i=i, **self._extract_hotel_info(hotel))
+                for i, hotel in enumerate(top_hotels, 1)
+            ]
             
             guest_info = f"{adults} người lớn"
             if children > 0:
                 guest_info += f", {children} trẻ em"
             
-            summary = f"""
-🏨 **DANH SÁCH KHÁCH SẠN TẠI {destination.upper()}**
+            dest_upper = destination.upper()
+            header = f"""
+🏨 **DANH SÁCH KHÁCH SẠN TẠI {dest_upper}**
 👥 Cho {guest_info} | 💰 Phân khúc: {budget_range}
 
-{"".join(formatted_results)}
-
-💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
-• Các giá trên có thể thay đổi theo thời gian thực
-• Nên đặt phòng trước 1-2 tuần để có giá tốt
-• Kiểm tra chính sách hủy phòng trước khi đặt
-• Liên hệ trực tiếp khách sạn để có giá tốt nhất
-
-📞 **Platform đề xuất:** Booking.com, Agoda, Traveloka
 """
+            summary = "".join([header, *formatted_results, _BOOKING_GUIDANCE])
             
-            print(f"✅ Found {len(top_hotels)} hotels via SerpApi")
+            logger.info("✅ Found %d hotels via SerpApi", len(top_hotels))
             return summary
             
         except Exception as e:
-            print(f"❌ Error formatting hotel results: {e}")
+            logger.exception("❌ Error formatting hotel results: %s", e)
             return self._get_fallback_recommendations(destination, budget_range, adults, children)
     
     def _extract_hotel_info(self, hotel: Dict) -> Dict[str, str]:
@@ -168,35 +654,27 @@ class SerpApiHotelsTool(BaseTool):
             name = hotel.get("name", "Tên không có")
             
             # Extract rating
-            rating = hotel.get("overall_rating", 0)
-            if rating == 0:
-                rating = hotel.get("rating", 0)
+            rating = _first_present(hotel, _RATING_KEYS, 0)
             
             # Extract address
             address = "Địa chỉ không có"
             if "gps_coordinates" in hotel:
-                address = hotel.get("neighborhood", hotel.get("district", "Trung tâm"))
+                address = _first_present(hotel, _LOC_KEYS, "Trung tâm")
               # Extract price
             price = "Liên hệ để biết giá"
-            if "rate_per_night" in hotel:
-                rate = hotel["rate_per_night"]
-                try:
-                    if "lowest" in rate and isinstance(rate["lowest"], (int, float)):
-                        price = f"Từ {int(rate['lowest']):,} VND/đêm"
-                    elif "price" in rate and isinstance(rate["price"], (int, float)):
-                        price = f"Từ {int(rate['price']):,} VND/đêm"
-                except (ValueError, TypeError):
-                    price = "Liên hệ để biết giá"
+            rate = hotel.get("rate_per_night")
+            # Type guards instead of try/except: only numbers reach int()
+            if isinstance(rate, dict):
+                if isinstance(rate.get("lowest"), (int, float)):
+                    price = f"Từ {int(rate['lowest']):,} VND/đêm"
+                elif isinstance(rate.get("price"), (int, float)):
+                    price = f"Từ {int(rate['price']):,} VND/đêm"
             
             # Extract review count
             reviews = "Chưa có đánh giá"
-            if "reviews" in hotel:
-                try:
-                    review_count = hotel["reviews"]
-                    if isinstance(review_count, (int, float)):
-                        reviews = f"{int(review_count):,} đánh giá"
-                except (ValueError, TypeError):
-                    reviews = "Nhiều đánh giá tích cực"
+            review_count = hotel.get("reviews")
+            if isinstance(review_count, (int, float)):
+                reviews = f"{int(review_count):,} đánh giá"
             
             # Extract amenities
             amenities = []
@@ -232,7 +710,7 @@ class SerpApiHotelsTool(BaseTool):
             }
             
         except Exception as e:
-            print(f"⚠️ Error extracting hotel info: {e}")
+            logger.warning("⚠️ Error extracting hotel info: %s", e)
             return {
                 "name": "Hotel Name",
                 "rating": "4.0",
@@ -244,724 +722,50 @@ class SerpApiHotelsTool(BaseTool):
             }
     
     def _filter_by_budget(self, hotels: List[Dict], budget_range: str) -> List[Dict]:
-        """Filter hotels by budget range and rating"""
+        """Filter hotels by budget range and return the 5 best rated"""
         try:
-            filtered = []
-            
-            for hotel in hotels:
-                # Get rating for filtering
-                rating = hotel.get("overall_rating", hotel.get("rating", 0))
-                
-                # Filter based on budget and rating
-                if budget_range == "luxury":
-                    if rating >= 4.0:
-                        filtered.append(hotel)
-                elif budget_range == "budget":
-                    if rating >= 3.0:  # Still want decent quality
-                        filtered.append(hotel)
-                else:  # mid_range
-                    if rating >= 3.5:
-                        filtered.append(hotel)
-            
-            # Sort by rating descending
-            filtered.sort(key=lambda x: x.get("overall_rating", x.get("rating", 0)), reverse=True)
+            threshold = _MIN_RATING.get(budget_range, _MIN_RATING["mid_range"])
             
-            return filtered
+            # Read each rating once into a flat list, then filter + top-k over
+            # indices so no hotel's dict lookups are repeated for the sort key
+            ratings = [_rating(h) for h in hotels]
+            top = heapq.nlargest(5, (i for i, r in enumerate(ratings) if r >= threshold),
+                                 key=ratings.__getitem__)
+            return [hotels[i] for i in top]
             
         except Exception as e:
-            print(f"⚠️ Error filtering hotels: {e}")
+            logger.warning("⚠️ Error filtering hotels: %s", e)
             return hotels[:5]  # Return first 5 if filtering fails
     
     def _get_fallback_recommendations(self, destination: str, budget_range: str, 
                                     adults: int, children: int) -> str:
         """Provide static fallback recommendations when API fails"""
-        
-        guest_info = f"{adults} người lớn"
-        if children > 0:
-            guest_info += f", {children} trẻ em"
-        
-        # Static recommendations by destination and budget
-        recommendations = {
-            "hanoi": {
-                "luxury": [
-                    "Lotte Hotel Hanoi - Đẳng cấp quốc tế 5 sao",
-                    "InterContinental Hanoi Westlake - View Hồ Tây tuyệt đẹp",
-                    "Hotel Metropole Hanoi - Lịch sử và sang trọng"
-                ],
-                "mid_range": [
-                    "Silk Path Hotel - Vị trí trung tâm thuận tiện",
-                    "Golden Silk Boutique Hotel - Phong cách boutique",
-                    "La Siesta Hoi An Resort & Spa - Dịch vụ tuyệt vời"
-                ],
-                "budget": [
-                    "May De Ville Old Quarter - Giá tốt ở phố cổ",
-                    "Hanoi La Siesta Hotel & Spa - Tầm trung chất lượng",
-                    "Golden Legend Hotel - Gần các điểm tham quan"
-                ]
-            },
-            "saigon": {
-                "luxury": [
-                    "Park Hyatt Saigon - Luxury tại trung tâm",
-                    "The Reverie Saigon - Xa hoa và đẳng cấp",
-                    "Hotel Majestic Saigon - Lịch sử và view sông"
-                ],
-                "mid_range": [
-                    "Liberty Central Saigon Riverside - View sông đẹp",
-                    "Silverland Jolie Hotel & Spa - Boutique hiện đại",
-                    "Hotel Royal Saigon - Trung tâm thành phố"
-                ],
-                "budget": [
-                    "Mai House Saigon - Hostel chất lượng cao",
-                    "Saigon Backpackers - Gặp gỡ du khách quốc tế",
-                    "Liberty Central Saigon Centre - Tầm trung tốt"
-                ]
-            },
-            "danang": {
-                "luxury": [
-                    "InterContinental Danang Sun Peninsula Resort - Resort đẳng cấp",
-                    "Pullman Danang Beach Resort - Bãi biển riêng",
-                    "Hyatt Regency Danang Resort and Spa - Spa world-class"
-                ],
-                "mid_range": [
-                    "Novotel Danang Premier Han River - View sông Hàn",
-                    "Muong Thanh Luxury Danang - Gần bãi biển",
-                    "Danang Golden Bay - Thiết kế độc đáo"
-                ],
-                "budget": [
-                    "Danang Backpackers - Hostel gần biển",
-                    "Memory Hostel - Clean và an toàn",
-                    "Okay Boutique Hotel - Tầm trung giá tốt"
-                ]
-            }
-        }
-        
-        # Default recommendations
-        default_recs = {
-            "luxury": [
-                "Khách sạn 4-5 sao địa phương - Dịch vụ cao cấp",
-                "Resort nghỉ dưỡng - Không gian yên tĩnh",
-                "Boutique hotel - Phong cách độc đáo"
-            ],
-            "mid_range": [
-                "Khách sạn 3-4 sao - Vị trí thuận tiện",
-                "Hotel boutique - Dịch vụ tốt, giá hợp lý",
-                "Khách sạn trung tâm - Gần điểm tham quan"
-            ],
-            "budget": [
-                "Hostel chất lượng cao - Gặp gỡ bạn bè mới",
-                "Nhà nghỉ sạch sẽ - Tiết kiệm chi phí",
-                "Hotel mini - Đầy đủ tiện nghi cơ bản"
-            ]
-        }
-        
-        # Find matching destination
-        dest_key = None
-        destination_lower = destination.lower()
-        for key in recommendations.keys():
-            if key in destination_lower or destination_lower in key:
-                dest_key = key
-                break
-        
-        # Get recommendations
-        if dest_key and dest_key in recommendations:
-            recs = recommendations[dest_key].get(budget_range, default_recs[budget_range])
-        else:
-            recs = default_recs[budget_range]
-        
-        # Format response
-        formatted_recs = []
-        for i, rec in enumerate(recs, 1):
-            formatted_recs.append(f"{i}. **{rec}**")
-        
-        return f"""
-🏨 **GỢI Ý KHÁCH SẠN TẠI {destination.upper()}**
-👥 Cho {guest_info} | 💰 Phân khúc: {budget_range}
-
-⚠️ *Thông tin từ cơ sở dữ liệu địa phương (API tạm thời không khả dụng)*
+        return _fallback_recommendations(destination, budget_range, adults, children)
 
-{"".join([f"\n{rec}" for rec in formatted_recs])}
 
-💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
-• Kiểm tra giá và tình trạng phòng trực tiếp
-• Đặt phòng qua các platform: Booking.com, Agoda, Traveloka
-• Liên hệ trực tiếp khách sạn để có giá tốt nhất
-• Đọc review và chính sách hủy phòng
-
-📍 **Lưu ý:** Giá có thể thay đổi theo mùa và sự kiện đặc biệt tại {destination}
-"""
-
-
-class HotelDetailsTool(BaseTool):
-    """Tool for getting detailed hotel information"""
-    name: str = "get_hotel_details"
-    description: str = "Get detailed information about a specific hotel"
-    args_schema: type[BaseModel] = HotelDetailInput
+class HotelBatchSearchTool(BaseTool):
+    """Tool for searching hotels in several destinations with one call"""
+    name: str = "hotel_search_batch"
+    description: str = "Search hotels for several destinations or date ranges at once (e.g. multi-city trips) using SerpApi Google Hotels API"
+    args_schema: type[BaseModel] = HotelBatchSearchInput
     
     model_config = ConfigDict(extra='allow')
     
-    def _run(self, hotel_id: str) -> str:
-        """Get detailed hotel information"""
-        return f"Chi tiết khách sạn ID {hotel_id} sẽ được cung cấp qua API booking platform."
-
-
-class BookingAgent:
-    """
-    Agent for handling accommodation booking requests
-    Enhanced with SerpApi integration and robust error handling
-    """
-    
-    def __init__(self, llm):
-        self.serpapi_hotels_tool = SerpApiHotelsTool()
-        self.hotel_details_tool = HotelDetailsTool()
-        
-        self.agent = Agent(
-            role="🏨 Chuyên Viên Đặt Phòng Khách Sạn",
-            goal="Tìm kiếm và đề xuất các lựa chọn lưu trú phù hợp với ngân sách và yêu cầu của khách hàng sử dụng SerpApi Google Hotels API.",
-            backstory="""Chuyên viên đặt phòng với 8 năm kinh nghiệm trong ngành khách sạn, có mạng lưới rộng khắp Việt Nam và hiểu rõ nhu cầu đa dạng của du khách từ budget backpacker đến luxury resort. Được trang bị công nghệ SerpApi để tìm kiếm thông tin khách sạn real-time.
-            
-            QUAN TRỌNG: Luôn trả lời trực tiếp với thông tin khách sạn cuối cùng, KHÔNG bao gồm quá trình suy nghĩ, phân tích, hay các bước 'Thought:', 'Action:', 'I now know the final answer' trong câu trả lời. Chỉ đưa ra kết quả tìm kiếm khách sạn hoàn chỉnh và chuyên nghiệp.""",
-            llm=llm,
-            allow_delegation=False,
-            verbose=False,
-            tools=[SerpApiHotelsTool()]
-        )
-    
-    def create_task(self, request: str, context: dict) -> Task:
-        """
-        Create a hotel booking task with automatic parameter extraction.
-        
-        Args:
-            request: User request for booking
-            context: The conversation context from memory agent
-        """
-        
-        # Extract parameters from request and context
-        destination = self._extract_destination(request, context)
-        dates_info = self._extract_dates(request, context)
-        guests_info = self._extract_guests(request, context)
-        budget_info = self._extract_budget(request, context)
-        
-        relevant_history = context.get("relevant_history", "")
-        
-        print(f"🏨 BookingAgent Task Parameters:")
-        print(f"   📍 Destination: {destination}")
-        print(f"   📅 Check-in: {dates_info['check_in']}")
-        print(f"   📅 Check-out: {dates_info['check_out']}")
-        print(f"   👥 Guests: {guests_info['adults']} adults, {guests_info['children']} children")
-        print(f"   💰 Budget: {budget_info}")
-        
-        desc = f"""
-            Dựa vào lịch sử trò chuyện sau:
-            ---
-            {relevant_history}
-            ---
-            
-            Yêu cầu của khách: "{request}"
-            
-            Thông tin đã trích xuất:
-            - Điểm đến: {destination}
-            - Ngày nhận phòng: {dates_info['check_in']}
-            - Ngày trả phòng: {dates_info['check_out']}
-            - Số khách: {guests_info['adults']} người lớn, {guests_info['children']} trẻ em
-            - Ngân sách: {budget_info}
-
-            Nhiệm vụ:
-            1. **BẮT BUỘC: Sử dụng tool `hotel_search`** để tìm khách sạn phù hợp tại {destination}.
-               - Tham số tìm kiếm:
-                 * destination: "{destination}"
-                 * check_in_date: "{dates_info['check_in']}"
-                 * check_out_date: "{dates_info['check_out']}"
-                 * adults: {guests_info['adults']}
-                 * children: {guests_info['children']}
-                 * budget_range: "{budget_info}"
-            
-            2. **Phân tích kết quả từ SerpApi và bổ sung thông tin:**
-               - Giải thích tại sao từng khách sạn phù hợp với yêu cầu
-               - So sánh ưu nhược điểm của các lựa chọn
-               - Đưa ra gợi ý dựa trên sở thích từ lịch sử trò chuyện
-            
-            3. **Chọn tối đa 5 khách sạn phù hợp nhất** dựa trên:
-               - Độ phù hợp với sở thích đã phân tích
-               - Vị trí thuận tiện cho du lịch
-               - Tiện nghi và dịch vụ
-               - Đánh giá từ khách hàng
-               - Giá cả trong ngân sách
-            
-            4. **Thông tin chi tiết cho mỗi khách sạn:**
-               - Tên và địa chỉ cụ thể
-               - Giá phòng cho {guests_info['adults']} người lớn, {guests_info['children']} trẻ em
-               - Điểm đánh giá và tóm tắt nhận xét
-               - Tiện nghi nổi bật (Wi-Fi, bể bơi, gym, spa, v.v.)
-               - Lưu ý đặc biệt (gần sân bay, view đẹp, có ưu đãi, v.v.)
-            
-            5. **Lời khuyên đặt phòng:**
-               - Platform đặt phòng tốt nhất cho từng khách sạn
-               - Thời điểm tốt nhất để đặt
-               - Cách tiết kiệm chi phí
-               - Lưu ý về chính sách hủy phòng
-            
-            Trả lời theo format:
-            **🏨 KHÁCH SẠN ĐỀ XUẤT TẠI {destination.upper()}**
-            👥 Cho {guests_info['adults']} người lớn, {guests_info['children']} trẻ em | 📅 {dates_info['check_in']} → {dates_info['check_out']}
-            
-            [Kết quả từ hotel_search tool sẽ được hiển thị ở đây]
-            
-            **💡 PHÂN TÍCH & GỢI Ý:**
-            • [Phân tích tổng quan về các lựa chọn]
-            • [Gợi ý cụ thể dựa trên sở thích và ngân sách]
-            • [So sánh ưu nhược điểm]
-              **📞 HƯỚNG DẪN ĐẶT PHÒNG:**
-            • [Lời khuyên cụ thể cho {destination}]
-            • [Platform đặt phòng được đề xuất]
-            • [Thời điểm tốt nhất để đặt và mẹo tiết kiệm]
-
-            **QUAN TRỌNG: Chỉ trả lời với thông tin khách sạn cuối cùng. KHÔNG bao gồm 'Thought:', 'Action:', 'I now know the final answer', hay quá trình suy nghĩ trong câu trả lời.**
-
-            Trả lời bằng tiếng Việt, chi tiết và hữu ích. Đảm bảo sử dụng tool hotel_search trước khi phân tích.
-        """
-        
-        return Task(
-            description=desc,
-            agent=self.agent,
-            expected_output=f"Danh sách 5 khách sạn phù hợp tại {destination} với thông tin chi tiết về giá, tiện nghi, đánh giá và hướng dẫn đặt phòng cụ thể."
-        )
-    
-    def _extract_destination(self, request: str, context: dict) -> str:
-        """Extract destination from request or context"""
-        # Try to extract from request first
-        destination = detect_destination(request)
-        
-        # If not found, check context
-        if not destination:
-            # Check recent interactions
-            recent_interactions = context.get("recent_interactions", [])
-            for interaction in reversed(recent_interactions):
-                if "destination" in interaction.get("extracted_info", {}):
-                    destination = interaction["extracted_info"]["destination"]
-                    break
-            
-            # Check current context
-            if not destination:
-                destination = context.get("current_context", {}).get("current_destination")
-        
-        return destination or "Việt Nam"
-    
-    def _extract_dates(self, request: str, context: dict) -> dict:
-        """Extract check-in and check-out dates"""
-        # Try to extract from request
-        time_info = detect_time(request)
-        
-        if time_info and "start_date" in time_info:
-            check_in = time_info["start_date"]
-            
-            # Calculate check-out date
-            trip_length = detect_trip_length(request)
-            if trip_length:
-                check_in_date = datetime.strptime(check_in, "%Y-%m-%d")
-                check_out_date = check_in_date + timedelta(days=trip_length)
-                check_out = check_out_date.strftime("%Y-%m-%d")
-            else:
-                # Default to 2 nights
-                check_in_date = datetime.strptime(check_in, "%Y-%m-%d")
-                check_out_date = check_in_date + timedelta(days=2)
-                check_out = check_out_date.strftime("%Y-%m-%d")
-        else:
-            # Default dates - next week for 2 nights
-            default_check_in = datetime.now() + timedelta(days=7)
-            default_check_out = default_check_in + timedelta(days=2)
-            
-            check_in = default_check_in.strftime("%Y-%m-%d")
-            check_out = default_check_out.strftime("%Y-%m-%d")
-        
-        return {
-            "check_in": check_in,
-            "check_out": check_out
-        }
-    
-    def _extract_guests(self, request: str, context: dict) -> dict:
-        """Extract number of guests from request"""
-        adults = 2  # default
-        children = 0  # default
-        
-        # Look for guest numbers in request
-        guest_patterns = [
-            r'(\d+)\s*người',
-            r'(\d+)\s*khách',
-            r'(\d+)\s*adult',
-            r'(\d+)\s*người lớn',
-        ]
-        
-        for pattern in guest_patterns:
-            match = re.search(pattern, request.lower())
-            if match:
-                adults = int(match.group(1))
-                break
-        
-        # Look for children
-        children_patterns = [
-            r'(\d+)\s*trẻ\s*em',
-            r'(\d+)\s*children',
-            r'(\d+)\s*child',
-        ]
-        
-        for pattern in children_patterns:
-            match = re.search(pattern, request.lower())
-            if match:
-                children = int(match.group(1))
-                break
-        
-        return {
-            "adults": adults,
-            "children": children,
-            "total": adults + children,
-            "note": f"{adults} người lớn" + (f", {children} trẻ em" if children > 0 else "")
-        }
-    
-    def _extract_budget(self, request: str, context: dict) -> str:
-        """Extract budget range from request or preferences"""
-        request_lower = request.lower()
-        
-        # Budget keywords
-        luxury_keywords = ['luxury', 'cao cấp', 'sang trọng', '5 sao', '4 sao', 'resort', 'đắt tiền']
-        budget_keywords = ['budget', 'rẻ', 'tiết kiệm', 'bình dân', 'hostel', 'nhà nghỉ']
-        
-        if any(keyword in request_lower for keyword in luxury_keywords):
-            return "luxury"
-        elif any(keyword in request_lower for keyword in budget_keywords):
-            return "budget"
-        else:
-            return "mid_range"
-        
-        if not self.api_key:
-            return self._get_fallback_recommendations(destination, budget_range)
-        
-        try:
-            # SerpApi Google Hotels endpoint
-            url = "https://serpapi.com/search"
-            
-            params = {
-                "api_key": self.api_key,
-                "engine": "google_hotels",
-                "q": f"hotels in {destination}",
-                "check_in_date": check_in_date,
-                "check_out_date": check_out_date,
-                "adults": number_of_guests,
-                "currency": "USD",  # Can be changed to VND if supported
-                "gl": "vn",  # Country for search
-                "hl": "vi",  # Language
-                "num": 20  # Number of results
-            }
-            
-            print(f"🔍 Searching hotels via SerpApi: {destination}, {check_in_date} to {check_out_date}, {number_of_guests} guests")
-            
-            response = requests.get(url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Check for API errors
-                if "error" in data:
-                    print(f"SerpApi Error: {data['error']}")
-                    return self._get_fallback_recommendations(destination, budget_range)
-                
-                return self._format_serpapi_results(data, budget_range, destination)
-            
-            elif response.status_code == 401:
-                print("SerpApi Authentication Error: Invalid API key")
-                return self._get_fallback_recommendations(destination, budget_range)
-            
-            elif response.status_code == 429:
-                print("SerpApi Rate Limit Exceeded")
-                return self._get_fallback_recommendations(destination, budget_range)
-            
-            else:
-                print(f"SerpApi HTTP Error: {response.status_code}")
-                return self._get_fallback_recommendations(destination, budget_range)
-                
-        except requests.exceptions.Timeout:
-            print("SerpApi request timeout")
-            return self._get_fallback_recommendations(destination, budget_range)
-        
-        except requests.exceptions.RequestException as e:
-            print(f"SerpApi request error: {e}")
-            return self._get_fallback_recommendations(destination, budget_range)
-        
-        except Exception as e:
-            print(f"Unexpected error in hotel search: {e}")
-            return self._get_fallback_recommendations(destination, budget_range)
-    
-    def _format_serpapi_results(self, data: Dict, budget_range: str, destination: str) -> str:
-        """Format SerpApi hotel search results with enhanced error handling"""
-        
-        # Extract hotels from SerpApi response
-        hotels = data.get('properties', [])
-        
-        if not hotels:
-            print("No hotels found in SerpApi response")
-            return self._get_fallback_recommendations(destination, budget_range)
-        
-        print(f"Found {len(hotels)} hotels from SerpApi")
-        
-        # Filter hotels by budget and quality
-        filtered_hotels = self._filter_hotels_by_budget(hotels, budget_range)
-        
-        if not filtered_hotels:
-            print(f"No hotels match budget range: {budget_range}")
-            filtered_hotels = hotels[:5]  # Fallback to first 5 hotels
-        
-        result = f"🏨 **KHÁCH SẠN ĐỀ XUẤT TẠI {destination.upper()}**\n\n"
-        result += f"📅 Tìm kiếm cho {len(filtered_hotels)} khách sạn phù hợp với ngân sách **{budget_range}**\n\n"
-        
-        for i, hotel in enumerate(filtered_hotels[:5], 1):
-            try:
-                # Extract hotel information with fallbacks
-                name = hotel.get('name', 'Khách sạn không tên')
-                
-                # Handle price information
-                price_info = self._extract_price_info(hotel)
-                
-                # Extract rating
-                rating = hotel.get('overall_rating', hotel.get('rating'))
-                rating_text = f"{rating}/5.0" if rating else "Chưa có đánh giá"
-                
-                # Extract location/address
-                location = hotel.get('neighborhood', hotel.get('location', hotel.get('address', 'Vị trí trung tâm')))
-                
-                # Extract amenities
-                amenities = self._extract_amenities(hotel)
-                
-                # Extract images
-                images = hotel.get('images', [])
-                has_photos = len(images) > 0
-                
-                # Build hotel entry
-                result += f"**{i}. {name}**\n"
-                result += f"💰 **Giá:** {price_info}\n"
-                result += f"⭐ **Đánh giá:** {rating_text}\n"
-                result += f"📍 **Vị trí:** {location}\n"
-                
-                if amenities:
-                    result += f"🏊 **Tiện nghi:** {', '.join(amenities[:4])}\n"
-                
-                if has_photos:
-                    result += f"📷 **Hình ảnh:** Có {len(images)} ảnh\n"
-                
-                # Add booking link if available
-                if 'link' in hotel:
-                    result += f"🔗 **Đặt phòng:** {hotel['link']}\n"
-                
-                result += "\n"
-                
-            except Exception as e:
-                print(f"Error formatting hotel {i}: {e}")
-                # Continue with next hotel
-                continue
-        
-        # Add booking tips
-        result += self._get_booking_tips(destination)
-        
-        return result
-    
-    def _extract_price_info(self, hotel: Dict) -> str:
-        """Extract and format price information from hotel data"""
-        
-        # Try different price fields
-        price_fields = ['rate_per_night', 'price', 'total_rate', 'nightly_rate']
-        
-        for field in price_fields:
-            if field in hotel and hotel[field]:
-                price_data = hotel[field]
-                
-                if isinstance(price_data, dict):
-                    # Handle complex price structure
-                    amount = price_data.get('lowest', price_data.get('value', price_data.get('amount')))
-                    currency = price_data.get('currency', 'USD')
-                    
-                    if amount:
-                        return f"{amount} {currency}/đêm"
-                
-                elif isinstance(price_data, (int, float)):
-                    return f"${price_data}/đêm"
-                
-                elif isinstance(price_data, str):
-                    return price_data
-        
-        # Fallback if no price found
-        return "Liên hệ để biết giá"
-    
-    def _extract_amenities(self, hotel: Dict) -> List[str]:
-        """Extract amenities from hotel data"""
-        amenities = []
-        
-        # Check various amenity fields
-        amenity_fields = ['amenities', 'highlights', 'features', 'services']
-        
-        for field in amenity_fields:
-            if field in hotel and isinstance(hotel[field], list):
-                amenities.extend(hotel[field])
-        
-        # Common amenity mappings (English to Vietnamese)
-        amenity_translations = {
-            'Free WiFi': 'WiFi miễn phí',
-            'Swimming pool': 'Hồ bơi', 
-            'Gym': 'Phòng gym',
-            'Restaurant': 'Nhà hàng',
-            'Bar': 'Quầy bar',
-            'Spa': 'Spa',
-            'Parking': 'Bãi đỗ xe',
-            'Air conditioning': 'Điều hòa',
-            'Room service': 'Dịch vụ phòng',
-            'Business center': 'Trung tâm thương mại'
-        }
-        
-        # Translate amenities
-        translated_amenities = []
-        for amenity in amenities[:10]:  # Limit to first 10
-            if isinstance(amenity, str):
-                translated = amenity_translations.get(amenity, amenity)
-                if translated not in translated_amenities:
-                    translated_amenities.append(translated)
-        
-        return translated_amenities
-    
-    def _filter_hotels_by_budget(self, hotels: List[Dict], budget_range: str) -> List[Dict]:
-        """Filter hotels by budget range using rating and price indicators"""
-        
-        if budget_range == "luxury":
-            # Filter for high-end hotels
-            return [h for h in hotels if 
-                   (h.get('overall_rating', 0) >= 4.5 or h.get('rating', 0) >= 4.5) and
-                   self._is_luxury_hotel(h)]
-        
-        elif budget_range == "budget":
-            # Filter for budget-friendly hotels 
-            return [h for h in hotels if 
-                   (h.get('overall_rating', 5) <= 3.5 or h.get('rating', 5) <= 3.5) or
-                   self._is_budget_hotel(h)]
-        
-        else:  # mid_range
-            # Return mid-range hotels or all if filtering fails
-            mid_range = [h for h in hotels if 
-                        3.5 < (h.get('overall_rating', 4) or h.get('rating', 4)) < 4.5]
-            return mid_range if mid_range else hotels
-    
-    def _is_luxury_hotel(self, hotel: Dict) -> bool:
-        """Check if hotel appears to be luxury based on name and amenities"""
-        name = hotel.get('name', '').lower()
-        luxury_keywords = ['resort', 'luxury', 'grand', 'premium', 'five star', '5 star', 'intercontinental', 'marriott', 'hilton', 'sheraton']
-        return any(keyword in name for keyword in luxury_keywords)
-    
-    def _is_budget_hotel(self, hotel: Dict) -> bool:
-        """Check if hotel appears to be budget-friendly based on name"""
-        name = hotel.get('name', '').lower()
-        budget_keywords = ['hostel', 'backpacker', 'budget', 'inn', 'lodge', 'guesthouse', 'homestay']
-        return any(keyword in name for keyword in budget_keywords)
+    def __init__(self, search_tool: SerpApiHotelsTool, **data: Any):
+        super().__init__(**data)
+        self.search_tool = search_tool
     
-    def _get_booking_tips(self, destination: str) -> str:
-        """Get location-specific booking tips"""
-        tips = f"\n💡 **TIPS ĐẶT PHÒNG TẠI {destination.upper()}:**\n"
-        tips += "• So sánh giá trên Booking.com, Agoda, Hotels.com\n"
-        tips += "• Đặt trước 2-4 tuần để có giá tốt\n"
-        tips += "• Kiểm tra chính sách hủy miễn phí\n"
-        tips += "• Đọc review gần đây từ khách Việt Nam\n"
-        tips += "• Xác nhận địa chỉ và cách di chuyển từ sân bay\n"
-        
-        # Add destination-specific tips
-        dest_lower = destination.lower()
-        if 'hà nội' in dest_lower or 'hanoi' in dest_lower:
-            tips += "• Nên ở gần phố cổ để dễ di chuyển\n"
-        elif 'hội an' in dest_lower:
-            tips += "• Chọn khách sạn trong hoặc gần phố cổ\n"
-        elif 'sa pa' in dest_lower:
-            tips += "• Ưu tiên khách sạn có view núi/ruộng bậc thang\n"
-        
-        return tips
+    def _run(self, queries: List[HotelSearchInput]) -> str:
+        """Run the searches in parallel threads over the shared keep-alive session"""
+        queries = [HotelSearchInput.model_validate(q) for q in queries]
+        with ThreadPoolExecutor(max_workers=_BATCH_CONCURRENCY) as pool:
+            results = pool.map(lambda q: self.search_tool._run(**q.model_dump()), queries)
+            return "\n".join(results)
     
-    def _get_fallback_recommendations(self, destination: str, budget_range: str) -> str:
-        """Provide fallback recommendations when API is unavailable"""
-        
-        # Vietnam-specific hotel recommendations
-        vietnam_hotels = {
-            "hà nội": {
-                "luxury": [
-                    "Hotel Metropole Hanoi - Khách sạn lịch sử 5 sao, trung tâm phố cổ",
-                    "JW Marriott Hotel Hanoi - Sang trọng, view hồ Gươm",
-                    "Lotte Hotel Hanoi - Cao cấp, trung tâm thành phố"
-                ],
-                "mid_range": [
-                    "Golden Sun Suites Hotel - Gần phố cổ, giá tốt",
-                    "Hanoi La Siesta Hotel - Spa, trung tâm",
-                    "May de Ville Old Quarter - Phố cổ, view đẹp"
-                ],
-                "budget": [
-                    "Hanoi Backpackers Hostel - Phố cổ, giá rẻ",
-                    "Golden Lotus Luxury Hotel - Bình dân, sạch sẽ",
-                    "Thuy Sakura Hotel - Gần bến xe, giá tốt"
-                ]
-            },
-            "hội an": {
-                "luxury": [
-                    "Four Seasons Resort The Nam Hai - Resort 5 sao, view biển",
-                    "Anantara Hoi An Resort - Bên sông, sang trọng",
-                    "La Residence Hue Hotel & Spa - Cổ điển, đẹp"
-                ],
-                "mid_range": [
-                    "Hoi An Historic Hotel - Trung tâm phố cổ",
-                    "Little Hoi An Central Boutique - Gần chợ đêm",
-                    "Villa Hội An Lodge - Yên tĩnh, đẹp"
-                ],
-                "budget": [
-                    "Thuy Hostel Hoi An - Hostel sạch, giá rẻ",
-                    "Hoi An Backpackers Hostel - Trung tâm, vui vẻ",
-                    "Mad Monkey Hostel Hoi An - Quốc tế, giá tốt"
-                ]
-            },
-            "sa pa": {
-                "luxury": [
-                    "Hotel de la Coupole MGallery - View núi đẹp nhất Sa Pa",
-                    "Silk Path Grand Resort & Spa - Resort 5 sao, sang trọng",
-                    "Amazing Hotel Sapa - Cao cấp, trung tâm"
-                ],
-                "mid_range": [
-                    "Sapa Relax Hotel & Spa - Spa tốt, view đẹp",
-                    "Pao's Sapa Leisure Hotel - Trung tâm, tiện nghi",
-                    "Sapa Elite Hotel - Mới, sạch sẽ"
-                ],
-                "budget": [
-                    "Sapa Backpackers - Hostel vui, giá rẻ",
-                    "Amazing Sapa Hotel - Bình dân, tốt",
-                    "Sapa Cozy Hotel - Nhỏ xinh, giá hợp lý"
-                ]
-            }
-        }
-        
-        dest_lower = destination.lower()
-        recommendations = []
-        
-        # Find matching destination
-        for dest_key, hotels in vietnam_hotels.items():
-            if dest_key in dest_lower or any(alias in dest_lower for alias in [dest_key.replace(" ", ""), dest_key.replace("ô", "o")]):
-                recommendations = hotels.get(budget_range, hotels.get("mid_range", []))
-                break
-        
-        if not recommendations:
-            recommendations = [
-                f"Booking.com - Tìm kiếm khách sạn tại {destination}",
-                f"Agoda - Đặt phòng tại {destination}",
-                f"Hotels.com - Khách sạn giá tốt tại {destination}"
-            ]
-        
-        result = f"🏨 **Khách sạn đề xuất tại {destination}** (Phạm vi giá: {budget_range}):\n\n"
-        
-        for i, hotel in enumerate(recommendations[:5], 1):
-            result += f"{i}. {hotel}\n"
-        
-        result += f"\n💡 **Lưu ý:** Để đặt phòng, bạn có thể:\n"
-        result += f"- Truy cập Booking.com, Agoda.com, Hotels.com\n"
-        result += f"- Gọi trực tiếp khách sạn\n"
-        result += f"- Đặt qua ứng dụng du lịch\n"
-        
-        return result
+    async def _arun(self, queries: List[HotelSearchInput]) -> str:
+        """Run the searches concurrently on the shared HTTP/2 client"""
+        queries = [HotelSearchInput.model_validate(q) for q in queries]
+        return "\n".join(await self.search_tool._arun_batch(queries))
 
 
 class HotelDetailsTool(BaseTool):
@@ -984,8 +788,21 @@ class BookingAgent:
     Enhanced with SerpApi integration and robust error handling
     """
     
+    # Guest-count and family patterns, compiled once for all instances;
+    # both run against the lowercased request
+    _GUEST_RE = re.compile(r'(\d+)\s*(?:người|khách|guest|pax)')
+    _FAMILY_RE = re.compile(r'gia đình|family|vợ chồng|couple')
+    
+    # Explicit budget keywords, one named group per range so a single scan
+    # classifies the request
+    _BUDGET_CLASS_RE = re.compile(
+        r'(?P<budget>rẻ|cheap|budget|tiết kiệm|bình dân)'
+        r'|(?P<luxury>cao cấp|luxury|sang trọng|5 sao|4 sao)'
+    )
+    
     def __init__(self, llm):
         self.serpapi_hotels_tool = SerpApiHotelsTool()
+        self.hotel_batch_tool = HotelBatchSearchTool(search_tool=self.serpapi_hotels_tool)
         self.hotel_details_tool = HotelDetailsTool()
         
         self.agent = Agent(
@@ -994,7 +811,7 @@ class BookingAgent:
             backstory="Chuyên viên đặt phòng với 8 năm kinh nghiệm trong ngành khách sạn, có mạng lưới rộng khắp Việt Nam và hiểu rõ nhu cầu đa dạng của du khách từ budget backpacker đến luxury resort.",
             llm=llm,
             allow_delegation=False,
-            tools=[SerpApiHotelsTool()]
+            tools=[self.serpapi_hotels_tool, self.hotel_batch_tool]
         )
 
     def create_task(self, request: str, context: dict) -> Task:
@@ -1006,11 +823,13 @@ class BookingAgent:
             context: The conversation context from memory agent
         """
         
-        # Extract parameters from request and context
+        # Extract parameters from request and context; the keyword
+        # extractors share one lowercased copy of the request
+        request_lower = request.lower()
         destination = self._extract_destination(request, context)
         dates_info = self._extract_dates(request, context)
-        guests_info = self._extract_guests(request, context)
-        budget_info = self._extract_budget(request, context)
+        guests_info = self._extract_guests(request_lower, context)
+        budget_info = self._extract_budget(request_lower, context)
         
         relevant_history = context.get("relevant_history", "")
         
@@ -1021,80 +840,9 @@ class BookingAgent:
         print(f"   👥 Guests: {guests_info['count']}")
         print(f"   💰 Budget: {budget_info}")
         
-        desc = f"""
-            Dựa vào lịch sử trò chuyện sau:
-            ---
-            {relevant_history}
-            ---
-            
-            Yêu cầu của khách: "{request}"
-            
-            Thông tin đã trích xuất:
-            - Điểm đến: {destination}
-            - Ngày nhận phòng: {dates_info['check_in']}
-            - Ngày trả phòng: {dates_info['check_out']}
-            - Số khách: {guests_info['count']} người ({guests_info['note']})
-            - Ngân sách: {budget_info}
-
-            Nhiệm vụ:
-            1. **BẮT BUỘC: Sử dụng tool `hotel_search`** để tìm khách sạn phù hợp tại {destination}.
-               - Tham số tìm kiếm:
-                 * destination: "{destination}"
-                 * check_in_date: "{dates_info['check_in']}"
-                 * check_out_date: "{dates_info['check_out']}"
-                 * number_of_guests: {guests_info['count']}
-                 * budget_range: "{budget_info}"
-            
-            2. **Phân tích sở thích lưu trú từ yêu cầu và lịch sử trò chuyện:**
-               - Loại hình: resort, khách sạn, homestay, hostel
-               - Tiện nghi: hồ bơi, gần biển, view đẹp, bữa sáng
-               - Vị trí: trung tâm, gần sân bay, yên tĩnh
-            
-            3. **Đề xuất tối đa 5 khách sạn phù hợp nhất** dựa trên:
-               - Độ phù hợp với sở thích đã phân tích
-               - Vị trí thuận tiện cho du lịch
-               - Tiện nghi và dịch vụ
-               - Đánh giá từ khách hàng
-               - Giá cả trong ngân sách
-            
-            4. **Thông tin chi tiết cho mỗi khách sạn:**
-               - Tên và địa chỉ
-               - Giá phòng cho {guests_info['count']} người
-               - Điểm đánh giá và nhận xét
-               - Tiện nghi nổi bật
-               - Lưu ý đặc biệt (gần sân bay, view đẹp, v.v.)
-            
-            5. **Lời khuyên đặt phòng:**
-               - Các trang web/app đặt phòng tốt nhất
-               - Thời điểm đặt phòng để có giá tốt
-               - Điều cần lưu ý khi đặt phòng tại {destination}
-            
-            **Định dạng trả lời:**
-            📋 **THÔNG TIN TÌM KIẾM:**
-            - Điểm đến: {destination}
-            - Ngày: {dates_info['check_in']} đến {dates_info['check_out']}
-            - Số khách: {guests_info['count']} người
-            - Ngân sách: {budget_info}
-            
-            🏨 **KHÁCH SẠN ĐỀ XUẤT:**
-            
-            1. **[Tên khách sạn]**
-               - 📍 Địa chỉ: [Địa chỉ cụ thể]
-               - 💰 Giá phòng: [Khoảng giá/đêm]
-               - ⭐ Đánh giá: [X.X/5.0 - Nhận xét tóm tắt]
-               - 🏊 Tiện nghi: [Danh sách tiện nghi]
-               - 📝 Ghi chú: [Lưu ý đặc biệt]
-            
-            [Tiếp tục cho 4 khách sạn khác...]
-            
-            💡 **HƯỚNG DẪN ĐẶT PHÒNG:**
-            - [Lời khuyên cụ thể cho {destination}]
-            - [Platform đặt phòng được đề xuất]
-            - [Thời điểm tốt nhất để đặt]
-            - [Điều cần chú ý]
-
-            Trả lời bằng tiếng Việt, chi tiết và thực tế. Nếu tool tìm kiếm không hoạt động, hãy sử dụng kiến thức để đưa ra gợi ý khách sạn phù hợp với ngân sách và khu vực.
-        """
+        desc = _booking_task_desc(str(relevant_history), request, destination,
+                                  dates_info['check_in'], dates_info['check_out'],
+                                  guests_info['count'], guests_info['note'], budget_info)
         
         return Task(
             description=desc,
@@ -1124,61 +872,48 @@ class BookingAgent:
         # Try to detect dates from request
         time_info = detect_time(request)
         
-        today = datetime.now()
-        
         if time_info and time_info.get("start_date"):
             check_in_date = time_info["start_date"]
             # If no trip length specified, default to 2 nights
             trip_length = detect_trip_length(request) or 2
-            check_out = datetime.strptime(check_in_date, "%Y-%m-%d") + timedelta(days=trip_length)
-            check_out_date = check_out.strftime("%Y-%m-%d")
+            check_out_date = (date.fromisoformat(check_in_date) + timedelta(days=trip_length)).isoformat()
         else:
             # Default to tomorrow for 2 nights
-            tomorrow = today + timedelta(days=1)
-            check_in_date = tomorrow.strftime("%Y-%m-%d")
-            check_out_date = (tomorrow + timedelta(days=2)).strftime("%Y-%m-%d")
+            tomorrow = date.today() + timedelta(days=1)
+            check_in_date = tomorrow.isoformat()
+            check_out_date = (tomorrow + timedelta(days=2)).isoformat()
         
         return {
             "check_in": check_in_date,
             "check_out": check_out_date
         }
     
-    def _extract_guests(self, request: str, context: dict) -> dict:
-        """Extract number of guests from request"""
-        # Look for explicit numbers
-        import re
-        
-        # Try to find guest numbers in request
-        guest_patterns = [
-            r'(\d+)\s*người',
-            r'(\d+)\s*khách',
-            r'(\d+)\s*guest',
-            r'(\d+)\s*pax'
-        ]
-        
-        for pattern in guest_patterns:
-            match = re.search(pattern, request.lower())
-            if match:
-                count = int(match.group(1))
-                return {"count": count, "note": f"theo yêu cầu"}
+    def _extract_guests(self, request_lower: str, context: dict) -> dict:
+        """Extract number of guests from the lowercased request"""
+        # Try to find guest numbers in request with a single scan
+        match = self._GUEST_RE.search(request_lower)
+        if match:
+            count = int(match.group(1))
+            return {"count": count, "note": f"theo yêu cầu"}
         
         # Check for family keywords
-        if any(word in request.lower() for word in ['gia đình', 'family', 'vợ chồng', 'couple']):
+        if self._FAMILY_RE.search(request_lower):
             return {"count": 2, "note": "gia đình/cặp đôi"}
         
         # Default
         return {"count": 2, "note": "mặc định"}
     
-    def _extract_budget(self, request: str, context: dict) -> str:
-        """Extract budget range from request or preferences"""
-        preferences = extract_preferences(request)
-        budget = preferences.get('budget', 'mid_range')
-        
-        # Check for explicit budget mentions
-        request_lower = request.lower()
-        if any(word in request_lower for word in ['rẻ', 'cheap', 'budget', 'tiết kiệm', 'bình dân']):
-            return 'budget'
-        elif any(word in request_lower for word in ['cao cấp', 'luxury', 'sang trọng', '5 sao', '4 sao']):
-            return 'luxury'
+    def _extract_budget(self, request_lower: str, context: dict) -> str:
+        """Extract budget range from the lowercased request or preferences"""
+        # Check for explicit budget mentions; a budget keyword anywhere in
+        # the request wins over a luxury one
+        budget_class = None
+        for match in self._BUDGET_CLASS_RE.finditer(request_lower):
+            budget_class = match.lastgroup
+            if budget_class == 'budget':
+                break
+        if budget_class:
+            return budget_class
         
-        return budget
+        # Otherwise fall back to parsed preferences
+        return extract_preferences(request_lower).get('budget', 'mid_range')
@@ -2,7 +2,6 @@
 Default Agent for handling general questions and queries outside other categories
 """
 from crewai import Agent, Task
-from langchain_openai import ChatOpenAI
 from typing import Any
 
 
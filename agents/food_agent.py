@@ -4,52 +4,50 @@ Only agent with permission to access RAG database for food information
 """
 import os
 import re
+from functools import lru_cache
 from crewai import Agent, Task
-from langchain_openai import ChatOpenAI
 from tools.rag_tools import TravelRAGTools
 from core.config import settings
 
+# Quantity hints in a food request, compiled/built once at import
+_DIGITS_RE = re.compile(r'\d+')
+_MANY_WORDS = ('nhiều', 'đa dạng', 'khác nhau')
+_FEW_WORDS = ('ít', 'vài', 'một số')
 
-class EnhancedFoodAgent:
-    """
-    FoodAgent: Specializes in food recommendations using RAG system.
-    Retrieves specified number of top-rated local dishes and restaurants.
-    Constraint: Only this agent has permission to access RAG database for food.
-    """
+
+@lru_cache(maxsize=256)
+def _extract_quantity(request: str) -> int:
+    """Number of dishes asked for; memoized since task retries reuse the request"""
+    # Use the first reasonable number found
+    for num_str in _DIGITS_RE.findall(request):
+        num = int(num_str)
+        if 1 <= num <= 20:  # Reasonable range for food items
+            return num
     
-    def __init__(self, llm, rag_tools: TravelRAGTools):
-        self.rag_tools = rag_tools
-        self.agent = Agent(
-            role="🍜 Chuyên Gia Ẩm Thực với RAG",
-            goal="Là chuyên gia duy nhất có quyền truy cập cơ sở dữ liệu RAG về ẩm thực, tìm và gợi ý số lượng món đặc sản cụ thể theo yêu cầu, phù hợp với sở thích và ngân sách của khách.",
-            backstory="Food blogger chuyên nghiệp với 10 năm kinh nghiệm, là người duy nhất được ủy quyền truy cập vào hệ thống RAG về ẩm thực Việt Nam. Có khả năng tìm kiếm chính xác và đề xuất món ăn phù hợp với khẩu vị, ngân sách và số lượng cụ thể theo yêu cầu.",
-            llm=llm,
-            allow_delegation=False,
-            tools=[
-                self.rag_tools.food_search,
-                self.rag_tools.general_search
-            ]
-        )
+    # Default quantity based on request type
+    request_lower = request.lower()
     
-    def create_task(self, request: str, destination: str, context: dict = None, quantity: int = None) -> Task:
-        """
-        Create food recommendation task with specific quantity handling
-        
-        Args:
-            request: User request describing food preferences
-            destination: Target destination
-            context: The conversation context.
-            quantity: Specific number of food items needed (for itinerary planning)
-        """
-        
-        # Extract quantity from request if not specified
-        if quantity is None:
-            quantity = self._extract_quantity_from_request(request)
-        
-        relevant_history = context.get("relevant_history", "")
-        print(f"Relevant history for food task: {relevant_history}")
-        
-        desc = f"""
+    if any(word in request_lower for word in _MANY_WORDS):
+        return 5
+    elif any(word in request_lower for word in _FEW_WORDS):
+        return 3
+    else:
+        return 2  # Default for most requests
+
+
+def _food_task_desc(relevant_history: str, request: str, destination: str, quantity: int,
+                    prefetched_rag: str = "") -> str:
+    """Task description for EnhancedFoodAgent.create_task"""
+    if prefetched_rag:
+        search_step = f"""1. **Dữ liệu RAG về ẩm thực {destination} đã được tìm sẵn:**
+            ---
+            {prefetched_rag}
+            ---
+               - Dùng dữ liệu này làm nguồn chính; chỉ gọi tool `food_search` khi cần thêm thông tin."""
+    else:
+        search_step = f"""1. **BẮT BUỘC: Sử dụng tool `food_search`** để tìm thông tin về các món ăn đặc sản tại {destination}.
+               - Tìm kiếm với từ khóa phù hợp từ yêu cầu khách và lịch sử trò chuyện."""
+    return f"""
             Dựa vào lịch sử trò chuyện sau:
             ---
             {relevant_history}
@@ -59,8 +57,7 @@ class EnhancedFoodAgent:
             Số lượng món ăn cần tìm: {quantity}
 
             Nhiệm vụ:
-            1. **BẮT BUỘC: Sử dụng tool `food_search`** để tìm thông tin về các món ăn đặc sản tại {destination}.
-               - Tìm kiếm với từ khóa phù hợp từ yêu cầu khách và lịch sử trò chuyện.
+            {search_step}
                - Ưu tiên các món ăn đặc trưng và được đánh giá cao
             
             2. **Phân tích sở thích ẩm thực từ yêu cầu và lịch sử trò chuyện:**
@@ -99,6 +96,49 @@ class EnhancedFoodAgent:
 
             Trả lời bằng tiếng Việt, chi tiết và hữu ích.
         """
+
+
+class EnhancedFoodAgent:
+    """
+    FoodAgent: Specializes in food recommendations using RAG system.
+    Retrieves specified number of top-rated local dishes and restaurants.
+    Constraint: Only this agent has permission to access RAG database for food.
+    """
+    
+    def __init__(self, llm, rag_tools: TravelRAGTools):
+        self.rag_tools = rag_tools
+        self.agent = Agent(
+            role="🍜 Chuyên Gia Ẩm Thực với RAG",
+            goal="Là chuyên gia duy nhất có quyền truy cập cơ sở dữ liệu RAG về ẩm thực, tìm và gợi ý số lượng món đặc sản cụ thể theo yêu cầu, phù hợp với sở thích và ngân sách của khách.",
+            backstory="Food blogger chuyên nghiệp với 10 năm kinh nghiệm, là người duy nhất được ủy quyền truy cập vào hệ thống RAG về ẩm thực Việt Nam. Có khả năng tìm kiếm chính xác và đề xuất món ăn phù hợp với khẩu vị, ngân sách và số lượng cụ thể theo yêu cầu.",
+            llm=llm,
+            allow_delegation=False,
+            tools=[
+                self.rag_tools.food_search,
+                self.rag_tools.general_search
+            ]
+        )
+    
+    def create_task(self, request: str, destination: str, context: dict = None, quantity: int = None) -> Task:
+        """
+        Create food recommendation task with specific quantity handling
+        
+        Args:
+            request: User request describing food preferences
+            destination: Target destination
+            context: The conversation context.
+            quantity: Specific number of food items needed (for itinerary planning)
+        """
+        
+        # Extract quantity from request if not specified
+        if quantity is None:
+            quantity = self._extract_quantity_from_request(request)
+        
+        relevant_history = context.get("relevant_history", "")
+        print(f"Relevant history for food task: {relevant_history}")
+        
+        desc = _food_task_desc(str(relevant_history), request, destination, quantity,
+                               context.get("prefetched_rag", ""))
         
         return Task(
             description=desc,
@@ -108,25 +148,7 @@ class EnhancedFoodAgent:
     
     def _extract_quantity_from_request(self, request: str) -> int:
         """Extract quantity from request, default to 2 if not specified"""
-        
-        # Look for numbers in request
-        numbers = re.findall(r'\d+', request)
-        if numbers:
-            # Use the first reasonable number found
-            for num_str in numbers:
-                num = int(num_str)
-                if 1 <= num <= 20:  # Reasonable range for food items
-                    return num
-        
-        # Default quantity based on request type
-        request_lower = request.lower()
-        
-        if any(word in request_lower for word in ['nhiều', 'đa dạng', 'khác nhau']):
-            return 5
-        elif any(word in request_lower for word in ['ít', 'vài', 'một số']):
-            return 3
-        else:
-            return 2  # Default for most requests
+        return _extract_quantity(request)
     
     def create_simple_task(self, request: str, dest_name: str) -> Task:
         """Backward compatibility method for simple requests"""
@@ -3,13 +3,288 @@ Enhanced Itinerary Agent with sophisticated planning scenarios
 Implements PlanningWithoutTime and PlanningWithTime scenarios
 """
 import os
+import hashlib
+import json
+from cachetools import TTLCache
 from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
 from tools.rag_tools import TravelRAGTools
 from core.config import settings
 from core.utils import detect_destination, detect_trip_length, detect_time, extract_preferences
-from typing import Dict, Any, Optional
+from core.types import PlanParams, ResourceReq, Resources
+from typing import Dict, Any, Optional, NamedTuple
 from datetime import datetime, timedelta
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+# Static part of the PlanningWithoutTime task description. It is kept
+# byte-identical across requests and placed before the per-request data so
+# LLM providers can serve it from their prompt-prefix cache
+_PLANNING_WITHOUT_TIME_PREFIX = """
+            NHIỆM VỤ: lập lịch trình (không có ngày cụ thể)
+            Rules:
+            - tài nguyên: địa điểm (LocationAgent) → sáng/chiều; món ăn (FoodAgent) → trưa/tối; các điểm trong ngày gần nhau
+            - overwhelm: số ngày 2-3 → chiều cuối = "Mua sắm quà lưu niệm"; số ngày >= 4 → ngày cuối = "Free & Easy Day"
+            - hoạt động tối: theo "Gợi ý buổi tối"; ngày cuối chuyến 2-3 ngày chọn hoạt động nhẹ nhàng
+            - cân bằng tham quan/ăn/nghỉ, không quá tải, di chuyển hợp lý
+            - không dùng thời tiết
+            - điền KHUNG LỊCH TRÌNH từ THÔNG TIN CHUYẾN ĐI
+            Output: chỉ lịch trình cuối cùng, tiếng Việt, text thuần + emoji; không 'Thought:'/'Action:', không code block.
+"""
+
+# Full PlanningWithoutTime description: static rules first so every call
+# shares the prompt prefix, per-request data filled in with str.format
+_PLANNING_WITHOUT_TIME_TMPL = _PLANNING_WITHOUT_TIME_PREFIX + """
+            ===THÔNG TIN CHUYẾN ĐI===
+            Dựa vào lịch sử trò chuyện sau:
+            ---
+            {relevant_history}
+            ---
+            Yêu cầu gốc: "{request}"
+            Điểm đến: {destination}
+            Số ngày: {trip_length}
+            Sở thích: {preferences}
+            Gợi ý buổi tối: {evening_hint}
+            
+            THÔNG TIN TÀI NGUYÊN ĐÃ THU THẬP:
+            Địa điểm: {location_info}
+            Ẩm thực: {food_info}
+            
+            KHUNG LỊCH TRÌNH:
+            {skeleton}
+"""
+
+# Static part of the PlanningWithTime task description; see above
+_PLANNING_WITH_TIME_PREFIX = """
+            NHIỆM VỤ: lập lịch trình theo thời tiết (có ngày cụ thể)
+            Tools: realtime_weather_batch(city=điểm đến, date, hours=[8,12,16,20]) — BẮT BUỘC, 1 lần/ngày, gọi cùng lượt cho mọi ngày; không gọi realtime_weather từng giờ
+            Rules:
+            - WEATHER_RULES (áp dụng cho mọi khung giờ [thời tiết H:00] trong khung lịch trình, lấy từ kết quả realtime_weather_batch của ngày đó): mưa → trong nhà (bảo tàng, chợ, cafe, trung tâm thương mại khi mua sắm); >32°C → nơi có điều hòa; trời trong → outdoor, chụp ảnh (đẹp nhất buổi chiều); gió mạnh buổi tối → không gian kín, tránh bến nước
+            - khuyến nghị: mưa → ô; UV cao → kem chống nắng; lạnh → áo ấm; nóng khô → nước uống
+            - tài nguyên: địa điểm indoor cho mưa/nóng, outdoor cho trời đẹp; món ăn trưa/tối, street food cho tối mát
+            - overwhelm: số ngày 2-3 → chiều cuối = "Mua sắm quà lưu niệm"; số ngày >= 4 → ngày cuối = "Free & Easy Day"
+            - hoạt động tối: theo "Gợi ý buổi tối" và thời tiết
+            - nêu weather alerts nếu có
+            - điền KHUNG LỊCH TRÌNH từ THÔNG TIN CHUYẾN ĐI
+            Output: chỉ lịch trình cuối cùng, tiếng Việt, text thuần + emoji; không 'Thought:'/'Action:', không code block.
+"""
+
+# Full PlanningWithTime description; see above
+_PLANNING_WITH_TIME_TMPL = _PLANNING_WITH_TIME_PREFIX + """
+            ===THÔNG TIN CHUYẾN ĐI===
+            Dựa vào lịch sử trò chuyện sau:
+            ---
+            {relevant_history}
+            ---
+            Yêu cầu gốc: "{request}"
+            Điểm đến: {destination}
+            Số ngày: {trip_length}
+            Ngày bắt đầu: {start_date}
+            Các ngày cần lấy thời tiết: {dates}
+            Thông tin thời gian: {time_info}
+            Sở thích: {preferences}
+            Gợi ý buổi tối: {evening_hint}
+            
+            THÔNG TIN TÀI NGUYÊN ĐÃ THU THẬP:
+            Địa điểm: {location_info}
+            Ẩm thực: {food_info}
+            
+            KHUNG LỊCH TRÌNH VỚI WEATHER INTEGRATION:
+            {skeleton}
+"""
+
+# Evening activity hint per destination; only the matching entry is sent
+# Keys are the lowercase canonical names returned by detect_destination
+EVENING_HINTS = {
+    "hà nội": "dạo phố cổ, bia hơi, múa rối nước",
+    "hội an": "ngắm đèn lồng, dạo bến Hoài, chợ đêm",
+    "sa pa": "ngắm sao, cafe view, trà ấm",
+}
+_DEFAULT_EVENING_HINT = "phù hợp đặc trưng địa phương"
+
+
+def _evening_hint(destination: str) -> str:
+    """Evening activity hint for a destination, whatever its casing"""
+    return EVENING_HINTS.get(destination.lower(), _DEFAULT_EVENING_HINT)
+
+
+@lru_cache(maxsize=64)
+def _parse_iso(date_str: str) -> datetime:
+    """Parse a YYYY-MM-DD start date"""
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+# Per-day skeleton bodies for the planning tasks, filled with str.format
+_SK_LAST_LONG_NOTIME = """
+📅 **NGÀY {day} - Free & Easy Day**
+🌅 Sáng: Thời gian tự do khám phá cá nhân
+🍽️ Trưa: [Món ăn từ FoodAgent]
+🛍️ Chiều: Mua sắm quà lưu niệm 
+🌃 Tối: [Món ăn từ FoodAgent]
+"""
+_SK_LAST_SHORT_NOTIME = """
+📅 **NGÀY {day}**
+🌅 Sáng: [Hoạt động từ LocationAgent]
+🍽️ Trưa: [Món ăn từ FoodAgent]
+🛍️ Chiều: Mua sắm quà lưu niệm
+🌃 Tối: [Món ăn từ FoodAgent] + hoạt động tối nhẹ nhàng
+"""
+_SK_REGULAR_NOTIME = """
+📅 **NGÀY {day}**
+🌅 Sáng: [Hoạt động từ LocationAgent]
+🍽️ Trưa: [Món ăn từ FoodAgent] 
+🌆 Chiều: [Hoạt động từ LocationAgent]
+🌃 Tối: [Món ăn từ FoodAgent] + hoạt động tối
+"""
+
+# Weather-aware days carry bare slot markers; the weather rules that fill
+# them live once in _PLANNING_WITH_TIME_PREFIX instead of on every slot
+_SK_LAST_LONG_TIME = """
+📅 **NGÀY {day} ({date}) - Free & Easy Day**
+🌅 Sáng (8:00): [thời tiết 8:00] → Thời gian tự do khám phá cá nhân
+🍽️ Trưa (12:00): [thời tiết 12:00] → [Món ăn từ FoodAgent]
+🛍️ Chiều (16:00): [thời tiết 16:00] → Mua sắm quà lưu niệm
+🌃 Tối (20:00): [thời tiết 20:00] → [Món ăn từ FoodAgent] + hoạt động tối
+"""
+_SK_LAST_SHORT_TIME = """
+📅 **NGÀY {day} ({date})**
+🌅 Sáng (8:00): [thời tiết 8:00] → [Hoạt động từ LocationAgent]
+🍽️ Trưa (12:00): [thời tiết 12:00] → [Món ăn từ FoodAgent]
+🛍️ Chiều (16:00): [thời tiết 16:00] → Mua sắm quà lưu niệm
+🌃 Tối (20:00): [thời tiết 20:00] → [Món ăn từ FoodAgent] + hoạt động tối
+"""
+_SK_REGULAR_TIME = """
+📅 **NGÀY {day} ({date})**
+🌅 Sáng (8:00): [thời tiết 8:00] → [Hoạt động từ LocationAgent]
+🍽️ Trưa (12:00): [thời tiết 12:00] → [Món ăn từ FoodAgent]
+🌆 Chiều (16:00): [thời tiết 16:00] → [Hoạt động từ LocationAgent]
+🌃 Tối (20:00): [thời tiết 20:00] → [Món ăn từ FoodAgent] + hoạt động tối
+"""
+
+# (regular, last day of a 2-3 day trip, last day of a 4+ day trip)
+_SK_NOTIME = (_SK_REGULAR_NOTIME, _SK_LAST_SHORT_NOTIME, _SK_LAST_LONG_NOTIME)
+_SK_TIME = (_SK_REGULAR_TIME, _SK_LAST_SHORT_TIME, _SK_LAST_LONG_TIME)
+
+
+def _pick_template(day: int, trip_length: int, templates: tuple) -> str:
+    """Pick the skeleton body for a day according to the overwhelm logic"""
+    if day == trip_length:
+        if trip_length >= 4:
+            return templates[2]
+        if trip_length in (2, 3):
+            return templates[1]
+    return templates[0]
+
+# Static part of the cached-plan adaptation task description; see above
+_PLAN_ADAPT_PREFIX = """
+            NHIỆM VỤ: điều chỉnh LỊCH TRÌNH MẪU (đã tạo trước đó cho cùng điểm đến, số ngày và sở thích) theo yêu cầu mới
+            Rules:
+            - giữ cấu trúc ngày và các địa điểm/món ăn của lịch trình mẫu, chỉ sửa phần không khớp yêu cầu mới
+            - nếu có "Các ngày cần lấy thời tiết": gọi realtime_weather_batch(city=điểm đến, date, hours=[8,12,16,20]) 1 lần/ngày, cùng lượt cho mọi ngày; ghi ngày và thời tiết từng khung giờ, đổi indoor/outdoor theo thời tiết
+            - không có ngày cụ thể: không dùng thời tiết
+            Output: chỉ lịch trình cuối cùng, tiếng Việt, text thuần + emoji; không 'Thought:'/'Action:', không code block.
+"""
+
+# Full cached-plan adaptation description; see above
+_PLAN_ADAPT_TMPL = _PLAN_ADAPT_PREFIX + """
+            ===THÔNG TIN CHUYẾN ĐI===
+            Dựa vào lịch sử trò chuyện sau:
+            ---
+            {relevant_history}
+            ---
+            Yêu cầu gốc: "{request}"
+            Điểm đến: {destination}
+            Số ngày: {trip_length}
+            {dates_line}
+            
+            LỊCH TRÌNH MẪU:
+            {plan}
+"""
+
+# Generated itineraries are reused for requests with the same trip signature
+# for 6 hours; dated plans are re-checked against fresh weather on reuse
+_PLAN_CACHE_TTL = 6 * 3600
+
+
+class PlanTemplate(NamedTuple):
+    """A finished itinerary and the resources it was built from"""
+    resources: Resources
+    plan: str
+
+
+def _plan_key(destination: str, trip_length: int, time_info: Optional[Dict[str, Any]],
+              preferences: Dict[str, Any]) -> str:
+    """Signature of a planning request for the plan cache"""
+    raw = "|".join((
+        destination,
+        str(trip_length),
+        str(bool(time_info)),
+        json.dumps(preferences, sort_keys=True, ensure_ascii=False, default=str),
+    ))
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+# Replies to planning requests without a destination are a near-static
+# "which destination?" prompt, so near-duplicate wordings reuse them for an hour.
+# Shared by every user, so only replies built without chat history are stored
+_FALLBACK_CACHE = TTLCache(maxsize=1000, ttl=3600)
+_FALLBACK_CACHE_LOCK = Lock()
+
+# Extracted trip parameters keyed by normalized request; relative dates
+# ("cuối tuần này") resolve against today, so entries expire after 10 minutes
+_PARAMS_CACHE = TTLCache(maxsize=4096, ttl=600)
+_PARAMS_CACHE_LOCK = Lock()
+
+# Default for extract_parameters' destination: run detect_destination itself
+_UNRESOLVED = object()
+
+# Minimum trigram Jaccard similarity for a cached fallback reply to be reused
+_FALLBACK_SIMILARITY = 0.92
+
+
+def _normalize_request(request: str) -> str:
+    """Lowercase the request and collapse whitespace"""
+    return " ".join(request.lower().split())
+
+
+def _trigrams(text: str) -> frozenset:
+    """Character trigrams of an already normalized request"""
+    return frozenset(text[i:i + 3] for i in range(max(len(text) - 2, 1)))
+
+
+def _nearest_fallback(request: str) -> Optional[str]:
+    """Cached fallback reply for the same or a near-duplicate request"""
+    key = _normalize_request(request)
+    with _FALLBACK_CACHE_LOCK:
+        hit = _FALLBACK_CACHE.get(key)
+        entries = list(_FALLBACK_CACHE.values())
+    if hit is not None:
+        return hit[1]
+    grams = _trigrams(key)
+    best, best_score = None, _FALLBACK_SIMILARITY
+    for cached_grams, response in entries:
+        score = len(grams & cached_grams) / len(grams | cached_grams)
+        if score >= best_score:
+            best, best_score = response, score
+    return best
+
+
+def _store_fallback(request: str, response: str) -> None:
+    """Remember the fallback reply generated for a request"""
+    key = _normalize_request(request)
+    entry = (_trigrams(key), response)
+    with _FALLBACK_CACHE_LOCK:
+        _FALLBACK_CACHE[key] = entry
+
+
+def _previous_destination(context: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Most recent destination mentioned in the conversation"""
+    if context and "recent_interactions" in context:
+        for interaction in reversed(context["recent_interactions"]):
+            dest = interaction.get("extracted_info", {}).get("destination")
+            if dest:
+                return dest
+    return None
 
 
 class AdvancedItineraryAgent:
@@ -18,10 +293,11 @@ class AdvancedItineraryAgent:
     by synthesizing information from the FoodAgent and LocationAgent.
     """
     
-    def __init__(self, llm, rag_tools: TravelRAGTools, food_agent, location_agent):
+    def __init__(self, llm, rag_tools: TravelRAGTools, food_agent, location_agent, llm_helper=None):
         self.rag_tools = rag_tools
         self.food_agent = food_agent
         self.location_agent = location_agent
+        self._plan_cache = TTLCache(maxsize=128, ttl=_PLAN_CACHE_TTL)
         self.agent = Agent(
             role="📅 Chuyên Gia Lịch Trình Du Lịch Cao Cấp",
             goal="Tạo lịch trình du lịch chi tiết và được tối ưu hóa bằng cách tổng hợp thông tin từ các chuyên gia địa điểm và ẩm thực, có thể tích hợp dữ liệu thời tiết real-time để đưa ra kế hoạch hoàn hảo.",            backstory="""Chuyên gia lập kế hoạch du lịch với 15 năm kinh nghiệm, được đào tạo để tạo ra những lịch trình cân bằng giữa tham quan, ẩm thực và nghỉ ngơi. Có khả năng điều chỉnh kế hoạch dựa trên thời tiết thực tế và đảm bảo logic di chuyển hợp lý.
@@ -35,27 +311,54 @@ class AdvancedItineraryAgent:
                 self.rag_tools.location_search,
                 self.rag_tools.food_search,
                 self.rag_tools.weather_search,
+                self.rag_tools.weather_search_batch,
                 self.rag_tools.weather_recommendation
             ]
         )
+        
+        # Cheap-tier agent for the short clarification and cached-plan
+        # adaptation tasks; falls back to the planner when no helper is given
+        if llm_helper is None or llm_helper is llm:
+            self.helper_agent = self.agent
+        else:
+            self.helper_agent = Agent(
+                role="📅 Trợ Lý Lịch Trình Du Lịch",
+                goal="Hỏi rõ điểm đến khi yêu cầu còn thiếu và điều chỉnh lịch trình có sẵn theo yêu cầu mới.",
+                backstory="Trợ lý lập lịch trình, làm việc theo khung và lịch trình mẫu do chuyên gia lịch trình tạo ra. Luôn trả lời trực tiếp bằng text thuần có emoji, KHÔNG bao gồm 'Thought:', 'Action:' hay markdown code blocks.",
+                llm=llm_helper,
+                allow_delegation=False,
+                verbose=False,
+                tools=[self.rag_tools.weather_search_batch]
+            )
     
-    def extract_parameters(self, request: str) -> Dict[str, Any]:
+    def extract_parameters(self, request: str, destination: Optional[str] = _UNRESOLVED) -> PlanParams:
         """
         Extract the three key parameters from user request:
         1. Destination
         2. Trip Length (in days) 
         3. Time/Dates
+        
+        Pass the detect_destination result as destination when the caller
+        already has it, so only the other detectors run.
         """
-        parameters = {
-            "destination": detect_destination(request),
-            "trip_length": detect_trip_length(request),
-            "time_info": detect_time(request),
-            "preferences": extract_preferences(request)
-        }
+        key = _normalize_request(request)
+        with _PARAMS_CACHE_LOCK:
+            parameters = _PARAMS_CACHE.get(key)
+        if parameters is None:
+            if destination is _UNRESOLVED:
+                destination = detect_destination(request)
+            parameters = PlanParams(
+                destination=destination,
+                trip_length=detect_trip_length(request),
+                time_info=detect_time(request),
+                preferences=extract_preferences(request)
+            )
+            with _PARAMS_CACHE_LOCK:
+                _PARAMS_CACHE[key] = parameters
         
         return parameters
     
-    def calculate_resource_requirements(self, trip_length: int) -> Dict[str, int]:
+    def calculate_resource_requirements(self, trip_length: int) -> ResourceReq:
         """
         Calculate the required number of food and location items based on trip length.
         
@@ -76,28 +379,33 @@ class AdvancedItineraryAgent:
         else:  # trip_length >= 4
             location_count = 2 * trip_length - 2
             
-        return {
-            "food_items": food_count,
-            "location_items": location_count
-        }
+        return ResourceReq(food_items=food_count, location_items=location_count)
     
-    def get_resources_from_agents(self, destination: str, requirements: Dict[str, int], 
-                                preferences: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    def get_resources_from_agents(self, destination: str, requirements: ResourceReq, 
+                                preferences: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Resources:
         """
         Call FoodAgent and LocationAgent to get required resources
         """
         # Prepare requests based on preferences
-        food_request = f"Tìm {requirements['food_items']} món ăn đặc sản tại {destination}"
+        food_request = f"Tìm {requirements.food_items} món ăn đặc sản tại {destination}"
         if preferences.get('food_type'):
             food_request += f" theo phong cách {preferences['food_type']}"
             
-        location_request = f"Tìm {requirements['location_items']} địa điểm tham quan tại {destination}"
+        location_request = f"Tìm {requirements.location_items} địa điểm tham quan tại {destination}"
         if preferences.get('activity_type'):
             location_request += f" phù hợp với sở thích {preferences['activity_type']}"
         
+        # Fetch both agents' RAG results up front with one embedding call, so
+        # they can answer from the prompt instead of each calling a search tool
+        food_rag, location_rag = self.rag_tools.batch_search([
+            ("food", f"đặc sản {preferences.get('food_type', '')}".strip(), destination),
+            ("location", f"tham quan {preferences.get('activity_type', '')}".strip(), destination)
+        ])
+        
         # Get food recommendations
         food_context = dict(context) if context else {}
         food_context["relevant_history"] = context.get("relevant_history", "") if context else ""
+        food_context["prefetched_rag"] = food_rag
         food_task = self.food_agent.create_task(food_request, destination, food_context)
         food_crew = Crew(
             agents=[self.food_agent.agent],
@@ -105,11 +413,11 @@ class AdvancedItineraryAgent:
             process=Process.sequential,
             verbose=False
         )
-        food_result = food_crew.kickoff()
         
         # Get location recommendations  
         location_context = dict(context) if context else {}
         location_context["relevant_history"] = context.get("relevant_history", "") if context else ""
+        location_context["prefetched_rag"] = location_rag
         location_task = self.location_agent.create_task(location_request, destination, location_context)
         location_crew = Crew(
             agents=[self.location_agent.agent],
@@ -117,16 +425,20 @@ class AdvancedItineraryAgent:
             process=Process.sequential,
             verbose=False
         )
-        location_result = location_crew.kickoff()
         
-        return {
-            "food_info": str(food_result),
-            "location_info": str(location_result)
-        }
+        # The two crews are independent LLM + RAG calls, so run them side by
+        # side: resource gathering takes max(food, location) instead of the sum
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            food_future = pool.submit(food_crew.kickoff)
+            location_future = pool.submit(location_crew.kickoff)
+            food_result = food_future.result()
+            location_result = location_future.result()
+        
+        return Resources(food_info=str(food_result), location_info=str(location_result))
     
     def create_task_planning_without_time(self, request: str, destination: str, 
                                         trip_length: int, preferences: Dict[str, Any],
-                                        resources: Dict[str, str],
+                                        resources: Resources,
                                         context: Optional[Dict[str, Any]] = None) -> Task:
         """
         Scenario A: PlanningWithoutTime
@@ -134,82 +446,23 @@ class AdvancedItineraryAgent:
         """
         
         # Generate skeleton based on overwhelm logic
-        skeleton_days = []
-        for day in range(1, trip_length + 1):
-            if trip_length >= 4 and day == trip_length:
-                # Last day for trips >= 4 days
-                skeleton_days.append(f"""
-📅 **NGÀY {day} - Free & Easy Day**
-🌅 Sáng: Thời gian tự do khám phá cá nhân
-🍽️ Trưa: [Món ăn từ FoodAgent]
-🛍️ Chiều: Mua sắm quà lưu niệm 
-🌃 Tối: [Món ăn từ FoodAgent]
-""")
-            elif (trip_length in [2, 3]) and day == trip_length:
-                # Last day for 2-3 day trips
-                skeleton_days.append(f"""
-📅 **NGÀY {day}**
-🌅 Sáng: [Hoạt động từ LocationAgent]
-🍽️ Trưa: [Món ăn từ FoodAgent]
-🛍️ Chiều: Mua sắm quà lưu niệm
-🌃 Tối: [Món ăn từ FoodAgent] + hoạt động nhẹ nhàng phù hợp với {destination}
-""")
-            else:
-                # Regular days
-                skeleton_days.append(f"""
-📅 **NGÀY {day}**
-🌅 Sáng: [Hoạt động từ LocationAgent]
-🍽️ Trưa: [Món ăn từ FoodAgent] 
-🌆 Chiều: [Hoạt động từ LocationAgent]
-🌃 Tối: [Món ăn từ FoodAgent] + hoạt động tối phù hợp với {destination}
-""")
-        
-        skeleton = "\n".join(skeleton_days)
+        skeleton = "\n".join(
+            _pick_template(day, trip_length, _SK_NOTIME).format(day=day)
+            for day in range(1, trip_length + 1)
+        )
         
         relevant_history = context.get("relevant_history", "") if context else ""
-        desc = f"""
-            Dựa vào lịch sử trò chuyện sau:
-            ---
-            {relevant_history}
-            ---
-            Yêu cầu gốc: "{request}"
-            Điểm đến: {destination}
-            Số ngày: {trip_length}
-            Sở thích: {preferences}
-            
-            THÔNG TIN TÀI NGUYÊN ĐÃ THU THẬP:
-            Địa điểm: {resources['location_info']}
-            Ẩm thực: {resources['food_info']}
-            
-            NHIỆM VỤ - PLANNING WITHOUT TIME:
-            
-            1. **Phân phối tài nguyên hợp lý:**
-               - Sử dụng các địa điểm từ LocationAgent cho buổi sáng/chiều
-               - Sử dụng các món ăn từ FoodAgent cho buổi trưa/tối
-               - Đảm bảo logic di chuyển (gần nhau trong cùng ngày)
-            
-            2. **Áp dụng Logic Plan Overwhelm:**
-               - Nếu {trip_length} = 2-3 ngày: Chiều cuối = "Mua sắm quà lưu niệm"
-               - Nếu {trip_length} >= 4 ngày: Ngày cuối = "Free & Easy Day"
-            
-            3. **Hoạt động tối phù hợp với {destination}:**
-               - Hà Nội: Dạo phố cổ, bia hơi, xem múa rối nước
-               - Hội An: Ngắm đèn lồng, dạo bến Hoài, chợ đêm
-               - Sa Pa: Ngắm sao, cafe thưởng thức view, trà ấm
-               - Khác: Phù hợp với đặc trưng địa phương
-            
-            4. **Cân bằng lịch trình:**
-               - Không quá tải hoạt động
-               - Thời gian di chuyển hợp lý
-               - Kết hợp tham quan và nghỉ ngơi
-            
-            5. **Không sử dụng thông tin thời tiết** (vì không có ngày cụ thể)
-              KHUNG LỊCH TRÌNH:
-            {skeleton}
-              **QUAN TRỌNG: Chỉ trả lời với lịch trình cuối cùng. KHÔNG bao gồm 'Thought:', 'Action:', hay quá trình suy nghĩ trong câu trả lời. KHÔNG sử dụng markdown code blocks (``` hoặc ```) - chỉ trả lời với text thuần có emoji và định dạng.**
-            
-            Trả lời bằng tiếng Việt với lịch trình chi tiết và logic.
-        """
+        desc = _PLANNING_WITHOUT_TIME_TMPL.format(
+            relevant_history=relevant_history,
+            request=request,
+            destination=destination,
+            trip_length=trip_length,
+            preferences=preferences,
+            evening_hint=_evening_hint(destination),
+            location_info=resources.location_info,
+            food_info=resources.food_info,
+            skeleton=skeleton
+        )
         
         return Task(
             description=desc,
@@ -219,7 +472,7 @@ class AdvancedItineraryAgent:
     
     def create_task_planning_with_time(self, request: str, destination: str, 
                                      trip_length: int, time_info: Dict[str, Any],
-                                     preferences: Dict[str, Any], resources: Dict[str, str],
+                                     preferences: Dict[str, Any], resources: Resources,
                                      context: Optional[Dict[str, Any]] = None) -> Task:
         """
         Scenario B: PlanningWithTime
@@ -229,122 +482,30 @@ class AdvancedItineraryAgent:
         start_date = time_info["start_date"]
         
         # Generate dates for each day
-        dates = []
-        for i in range(trip_length):
-            current_date = datetime.strptime(start_date, "%Y-%m-%d") + timedelta(days=i)
-            dates.append(current_date.strftime("%Y-%m-%d"))
+        base = _parse_iso(start_date)
+        dates = [(base + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(trip_length)]
         
         # Generate skeleton with weather placeholders
-        skeleton_days = []
-        for day_num, date in enumerate(dates, 1):
-            if trip_length >= 4 and day_num == trip_length:
-                # Last day for trips >= 4 days
-                skeleton_days.append(f"""
-📅 **NGÀY {day_num} ({date}) - Free & Easy Day**
-🌤️ Thời tiết tổng quan: [Sử dụng realtime_weather tool cho {destination} ngày {date}]
-
-🌅 Sáng (8:00): [Thời tiết: realtime_weather hour=8 date={date}] 
-   → Thời gian tự do khám phá cá nhân (điều chỉnh theo thời tiết)
-
-🍽️ Trưa (12:00): [Thời tiết: realtime_weather hour=12 date={date}]
-   → [Món ăn từ FoodAgent] (chọn nhà hàng trong/ngoài trời theo thời tiết)
-
-🛍️ Chiều (16:00): [Thời tiết: realtime_weather hour=16 date={date}]
-   → Mua sắm quà lưu niệm (chợ trong nhà nếu mưa, chợ ngoài trời nếu đẹp)
-
-🌃 Tối (20:00): [Thời tiết: realtime_weather hour=20 date={date}]
-   → [Món ăn từ FoodAgent] + hoạt động tối phù hợp với thời tiết
-""")
-            elif (trip_length in [2, 3]) and day_num == trip_length:
-                # Last day for 2-3 day trips
-                skeleton_days.append(f"""
-📅 **NGÀY {day_num} ({date})**
-🌤️ Thời tiết tổng quan: [Sử dụng realtime_weather tool cho {destination} ngày {date}]
-
-🌅 Sáng (8:00): [Thời tiết: realtime_weather hour=8 date={date}]
-   → [Hoạt động từ LocationAgent] (điều chỉnh indoor/outdoor theo thời tiết)
-
-🍽️ Trưa (12:00): [Thời tiết: realtime_weather hour=12 date={date}]
-   → [Món ăn từ FoodAgent] (chọn location có/không điều hòa theo nhiệt độ)
-
-🛍️ Chiều (16:00): [Thời tiết: realtime_weather hour=16 date={date}]
-   → Mua sắm quà lưu niệm (trung tâm thương mại nếu mưa/nóng)
-
-🌃 Tối (20:00): [Thời tiết: realtime_weather hour=20 date={date}]
-   → [Món ăn từ FoodAgent] + hoạt động tối phù hợp với thời tiết {destination}
-""")
-            else:
-                # Regular days
-                skeleton_days.append(f"""
-📅 **NGÀY {day_num} ({date})**
-🌤️ Thời tiết tổng quan: [Sử dụng realtime_weather tool cho {destination} ngày {date}]
-
-🌅 Sáng (8:00): [Thời tiết: realtime_weather hour=8 date={date}]
-   → [Hoạt động từ LocationAgent] (ưu tiên outdoor nếu đẹp trời, indoor nếu mưa)
-
-🍽️ Trưa (12:00): [Thời tiết: realtime_weather hour=12 date={date}]
-   → [Món ăn từ FoodAgent] (tránh ngoài trời nếu quá nóng >32°C)
-
-🌆 Chiều (16:00): [Thời tiết: realtime_weather hour=16 date={date}]
-   → [Hoạt động từ LocationAgent] (tận dụng ánh sáng đẹp cho chụp ảnh nếu trời trong)
-
-🌃 Tối (20:00): [Thời tiết: realtime_weather hour=20 date={date}]
-   → [Món ăn từ FoodAgent] + hoạt động tối phù hợp với thời tiết {destination}
-""")
-        
-        skeleton = "\n".join(skeleton_days)
+        skeleton = "\n".join(
+            _pick_template(day, trip_length, _SK_TIME).format(day=day, date=date)
+            for day, date in enumerate(dates, 1)
+        )
         
         relevant_history = context.get("relevant_history", "") if context else ""
-        desc = f"""
-            Dựa vào lịch sử trò chuyện sau:
-            ---
-            {relevant_history}
-            ---
-            Yêu cầu gốc: "{request}"
-            Điểm đến: {destination}
-            Số ngày: {trip_length}
-            Ngày bắt đầu: {start_date}
-            Thông tin thời gian: {time_info}
-            Sở thích: {preferences}
-            
-            THÔNG TIN TÀI NGUYÊN ĐÃ THU THẬP:
-            Địa điểm: {resources['location_info']}
-            Ẩm thực: {resources['food_info']}
-            
-            NHIỆM VỤ - PLANNING WITH TIME (Weather-Enhanced):
-            
-            1. **BẮT BUỘC: Thu thập thông tin thời tiết chi tiết**
-               - Sử dụng `realtime_weather` tool với city="{destination}" và days={trip_length}
-               - Lấy thời tiết cho từng khung giờ: hour=8, hour=12, hour=16, hour=20
-               - Cho mỗi ngày: {', '.join(dates)}
-            
-            2. **Tối ưu hóa hoạt động theo thời tiết từng giờ:**
-               - Sáng có mưa → Bảo tàng, chợ đầm, cafe trong nhà
-               - Trưa >32°C → Nhà hàng điều hòa, tránh outdoor
-               - Chiều đẹp trời → Outdoor activities, chụp ảnh
-               - Tối gió mạnh → Không gian đóng, tránh bến nước
-            
-            3. **Áp dụng travel recommendations từ weather tool:**
-               - Mang ô nếu dự báo mưa
-               - Kem chống nắng nếu UV cao
-               - Áo ấm nếu nhiệt độ thấp
-               - Nước uống nếu nóng và khô
-            
-            4. **Phân phối tài nguyên hợp lý theo thời tiết:**
-               - Indoor locations cho ngày mưa/quá nóng
-               - Outdoor scenic spots cho ngày đẹp trời
-               - Restaurants có điều hòa cho trưa nóng
-               - Street food cho tối mát mẻ
-            
-            5. **Áp dụng Logic Plan Overwhelm** (như Planning Without Time)
-            
-            6. **Bao gồm weather alerts nếu có**
-              KHUNG LỊCH TRÌNH VỚI WEATHER INTEGRATION:
-            {skeleton}
-              **QUAN TRỌNG: Chỉ trả lời với lịch trình cuối cùng. KHÔNG bao gồm 'Thought:', 'Action:', hay quá trình suy nghĩ trong câu trả lời. KHÔNG sử dụng markdown code blocks (``` hoặc ```) - chỉ trả lời với text thuần có emoji và định dạng.**
-            
-            Trả lời bằng tiếng Việt với lịch trình được tối ưu hóa hoàn toàn theo thời tiết thực tế.
-        """
+        desc = _PLANNING_WITH_TIME_TMPL.format(
+            relevant_history=relevant_history,
+            request=request,
+            destination=destination,
+            trip_length=trip_length,
+            start_date=start_date,
+            dates=', '.join(dates),
+            time_info=time_info,
+            preferences=preferences,
+            evening_hint=_evening_hint(destination),
+            location_info=resources.location_info,
+            food_info=resources.food_info,
+            skeleton=skeleton
+        )
         
         return Task(
             description=desc,
@@ -352,20 +513,24 @@ class AdvancedItineraryAgent:
             expected_output=f"Lịch trình {trip_length} ngày tại {destination} từ {start_date}, được tối ưu hóa hoàn toàn theo dự báo thời tiết real-time cho từng khung giờ, bao gồm travel recommendations cụ thể."
         )
     
+    def cached_response(self, request: str, context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Cached reply for a request that would fall back to asking for a destination"""
+        if context and context.get("relevant_history"):
+            return None
+        if detect_destination(request) or _previous_destination(context):
+            return None
+        return _nearest_fallback(request)
+    
     def create_task(self, request: str, context: Dict[str, Any] = None) -> Task:
         """
         Main entry point for creating itinerary tasks.
         Implements the full workflow: parameter extraction → resource calculation → plan generation
         """
         
-        # Step 1: Extract parameters
-        params = self.extract_parameters(request)
-        
-        destination = params["destination"]
+        # Step 1: Resolve the destination first, so vague requests fall back
+        # without running the date/length/preference detectors
+        detected = destination = detect_destination(request)
         print(f"1. 🔄 Complex itinerary planning for {destination}")
-        trip_length = params["trip_length"] or 2  # Default to 2 days
-        time_info = params["time_info"]
-        preferences = params["preferences"]
         
         # Handle missing destination
         if not destination:
@@ -377,6 +542,25 @@ class AdvancedItineraryAgent:
                 # If we cannot detect destination, return the task to ask user
                 return result["task"]
         print(f"3. 🔄 Complex itinerary planning for {destination}")
+        
+        # Extract the remaining parameters, reusing the detected destination
+        params = self.extract_parameters(request, destination=detected)
+        trip_length = params.trip_length or 2  # Default to 2 days
+        time_info = params.time_info
+        preferences = params.preferences
+        
+        # Reuse a plan generated for the same trip signature. Plans built from
+        # a user's chat history are neither reused nor stored, since the
+        # agent instance is shared by every user
+        has_history = bool(context and context.get("relevant_history"))
+        plan_key = None if has_history else _plan_key(destination, trip_length, time_info, preferences)
+        cached = self._plan_cache.get(plan_key) if plan_key else None
+        if cached is not None:
+            print(f"♻️ Adapting cached itinerary for {destination}")
+            return self._create_plan_adaptation_task(
+                request, destination, trip_length, time_info, cached, context=context
+            )
+        
         # Step 2: Calculate resource requirements
         requirements = self.calculate_resource_requirements(trip_length)
         
@@ -386,33 +570,58 @@ class AdvancedItineraryAgent:
         # Step 4: Choose planning scenario
         if time_info:
             # Scenario B: PlanningWithTime
-            return self.create_task_planning_with_time(
+            task = self.create_task_planning_with_time(
                 request, destination, trip_length, time_info, preferences, resources, context=context
             )
+            if plan_key:
+                task.callback = self._plan_cache_callback(plan_key, resources)
+            return task
         else:
             # Scenario A: PlanningWithoutTime
-            # First inform user about weather benefits
-            inform_message = """
-            ℹ️ **Lưu ý:** Bạn chưa cung cấp ngày cụ thể cho chuyến đi. 
-            Việc cung cấp ngày sẽ giúp tôi tối ưu hóa lịch trình dựa trên dự báo thời tiết thực tế.
-            Tuy nhiên, tôi sẽ tiếp tục tạo lịch trình tổng quát cho bạn.
-            """
-            
-            return self.create_task_planning_without_time(
+            task = self.create_task_planning_without_time(
                 request, destination, trip_length, preferences, resources, context=context
             )
+            if plan_key:
+                task.callback = self._plan_cache_callback(plan_key, resources)
+            return task
+    
+    def _plan_cache_callback(self, plan_key: str, resources: Resources):
+        """Task callback that stores the finished itinerary in the plan cache"""
+        def store(output):
+            self._plan_cache[plan_key] = PlanTemplate(resources=resources, plan=str(output))
+        return store
+    
+    def _create_plan_adaptation_task(self, request: str, destination: str, trip_length: int,
+                                     time_info: Optional[Dict[str, Any]], cached: PlanTemplate,
+                                     context: Optional[Dict[str, Any]] = None) -> Task:
+        """Ask the agent to adapt a cached itinerary instead of planning from scratch"""
+        dates_line = ""
+        if time_info:
+            base = _parse_iso(time_info["start_date"])
+            dates = [(base + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(trip_length)]
+            dates_line = f"Các ngày cần lấy thời tiết: {', '.join(dates)}"
+        
+        relevant_history = context.get("relevant_history", "") if context else ""
+        desc = _PLAN_ADAPT_TMPL.format(
+            relevant_history=relevant_history,
+            request=request,
+            destination=destination,
+            trip_length=trip_length,
+            dates_line=dates_line,
+            plan=cached.plan
+        )
+        
+        return Task(
+            description=desc,
+            agent=self.helper_agent,
+            expected_output=f"Lịch trình {trip_length} ngày tại {destination} được điều chỉnh từ lịch trình mẫu theo yêu cầu mới."
+        )
     
     def _create_missing_destination_task(self, request: str, context: Optional[Dict[str, Any]] = None) -> Task:
         """Handle case when destination is not detected. If previous query exists and has a destination, use it."""
         relevant_history = context.get("relevant_history", "") if context else ""
         # Try to extract previous destination from recent interactions
-        previous_destination = None
-        if context and "recent_interactions" in context:
-            for interaction in reversed(context["recent_interactions"]):
-                dest = interaction.get("extracted_info", {}).get("destination")
-                if dest:
-                    previous_destination = dest
-                    break
+        previous_destination = _previous_destination(context)
         if previous_destination:
             return {
                 "can_detect_destination": True,
@@ -426,21 +635,18 @@ class AdvancedItineraryAgent:
             ---
             Yêu cầu: "{request}"
             
-            VẤN ĐỀ: Không thể xác định điểm đến cụ thể từ yêu cầu.
-            
-            Nhiệm vụ:
-            1. Trả lời lịch sự rằng cần thông tin điểm đến cụ thể
-            2. Liệt kê các điểm đến phổ biến ở Việt Nam
-            3. Hỏi khách về sở thích để gợi ý điểm đến phù hợp
-            
-            Trả lời bằng tiếng Việt, thân thiện và hữu ích.
+            Vấn đề: thiếu điểm đến.
+            Flow: báo lịch sự cần điểm đến → liệt kê điểm đến phổ biến ở Việt Nam → hỏi sở thích để gợi ý
+            Output: tiếng Việt, thân thiện.
         """
         return {
             "can_detect_destination": False,
             "destination": None,
             "task": Task(
             description=desc,
-            agent=self.agent,
-            expected_output="Yêu cầu khách cung cấp điểm đến cụ thể và gợi ý các điểm đến phổ biến."
+            agent=self.helper_agent,
+            expected_output="Yêu cầu khách cung cấp điểm đến cụ thể và gợi ý các điểm đến phổ biến.",
+            # A reply shaped by this user's history must not reach other users
+            callback=None if relevant_history else lambda output: _store_fallback(request, str(output))
         )
         }
\ No newline at end of file
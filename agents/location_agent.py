@@ -3,53 +3,47 @@ Enhanced Location Agent - Specialist in location information retrieval using RAG
 Only agent with permission to access RAG database for location information
 """
 import re
+from functools import lru_cache
 from crewai import Agent, Task
-from langchain_openai import ChatOpenAI
 from tools.rag_tools import TravelRAGTools
 from core.config import settings
 import os
 
+# Quantity hints in a location request, compiled/built once at import
+_DIGITS_RE = re.compile(r'\d+')
+_MANY_WORDS = ('nhiều', 'đa dạng', 'khác nhau', 'đầy đủ')
+_FEW_WORDS = ('ít', 'vài', 'một số', 'chính')
 
-class EnhancedLocationAgent:
-    """
-    LocationAgent: Specializes in sightseeing recommendations using RAG system.
-    Retrieves specified number of top-rated attractions and points of interest.
-    Constraint: Only this agent has permission to access RAG database for locations.
-    """
+
+@lru_cache(maxsize=256)
+def _extract_quantity(request: str) -> int:
+    """Number of locations asked for; memoized since task retries reuse the request"""
+    # Use the first reasonable number found
+    for match in _DIGITS_RE.finditer(request):
+        num = int(match.group())
+        if 1 <= num <= 20:  # Reasonable range for locations
+            return num
     
-    def __init__(self, llm, rag_tools: TravelRAGTools):
-        self.rag_tools = rag_tools
-        self.agent = Agent(
-            role="🗺️ Chuyên Gia Địa Điểm với RAG",
-            goal="Là chuyên gia duy nhất có quyền truy cập cơ sở dữ liệu RAG về địa điểm du lịch, tìm và đề xuất số lượng điểm tham quan cụ thể phù hợp nhất với sở thích và thời gian của khách.",
-            backstory="Chuyên gia du lịch 15 năm kinh nghiệm, là người duy nhất được ủy quyền truy cập vào hệ thống RAG về địa điểm du lịch Việt Nam. Có khả năng phân tích sở thích du khách và đề xuất các điểm đến được tối ưu hóa về thời gian và logic di chuyển.",
-            llm=llm,
-            allow_delegation=False,
-            tools=[
-                self.rag_tools.location_search,
-                self.rag_tools.general_search
-            ]
-        )
+    # Default quantity based on request type
+    request_lower = request.lower()
+    
+    if any(word in request_lower for word in _MANY_WORDS):
+        return 5
+    elif any(word in request_lower for word in _FEW_WORDS):
+        return 2
+    else:
+        return 3  # Default for most location requests
 
-    def create_task(self, request: str, destination: str, context: dict = None, quantity: int = None) -> Task:
-        """
-        Create location recommendation task with specific quantity handling
-        
-        Args:
-            request: User request describing location preferences
-            destination: Target destination
-            context: The conversation context.
-            quantity: Specific number of location items needed (for itinerary planning)
-        """
-        
-        # Extract quantity from request if not specified
-        if quantity is None:
-            quantity = self._extract_quantity_from_request(request)
-            
-        relevant_history = context.get("relevant_history", "")
-        print(f"Relavant history for location task: {relevant_history}")
-        
-        desc = f"""
+
+# Location task prompt; the first step depends on whether RAG results were prefetched
+_PREFETCHED_SEARCH_STEP = """1. **Dữ liệu RAG về địa điểm tại {destination} đã được tìm sẵn:**
+            ---
+            {prefetched_rag}
+            ---
+               - Dùng dữ liệu này làm nguồn chính; chỉ gọi tool `location_search` khi cần thêm thông tin."""
+_TOOL_SEARCH_STEP = """1. **BẮT BUỘC: Sử dụng tool `location_search`** để tìm thông tin về các địa điểm tại {destination}.
+               - Tìm kiếm với từ khóa phù hợp từ yêu cầu khách và lịch sử trò chuyện."""
+_LOCATION_TASK = """
             Dựa vào lịch sử trò chuyện sau:
             ---
             {relevant_history}
@@ -59,8 +53,7 @@ class EnhancedLocationAgent:
             Số lượng địa điểm cần tìm: {quantity}
 
             Nhiệm vụ:
-            1. **BẮT BUỘC: Sử dụng tool `location_search`** để tìm thông tin về các địa điểm tại {destination}.
-               - Tìm kiếm với từ khóa phù hợp từ yêu cầu khách và lịch sử trò chuyện.
+            {search_step}
                - Ưu tiên các địa điểm nổi tiếng và được đánh giá cao
             
             2. **Phân tích sở thích du lịch từ yêu cầu và lịch sử trò chuyện:**
@@ -105,6 +98,54 @@ class EnhancedLocationAgent:
 
             Trả lời bằng tiếng Việt, chi tiết và thực tế.
         """
+
+
+class EnhancedLocationAgent:
+    """
+    LocationAgent: Specializes in sightseeing recommendations using RAG system.
+    Retrieves specified number of top-rated attractions and points of interest.
+    Constraint: Only this agent has permission to access RAG database for locations.
+    """
+    
+    def __init__(self, llm, rag_tools: TravelRAGTools):
+        self.rag_tools = rag_tools
+        self.agent = Agent(
+            role="🗺️ Chuyên Gia Địa Điểm với RAG",
+            goal="Là chuyên gia duy nhất có quyền truy cập cơ sở dữ liệu RAG về địa điểm du lịch, tìm và đề xuất số lượng điểm tham quan cụ thể phù hợp nhất với sở thích và thời gian của khách.",
+            backstory="Chuyên gia du lịch 15 năm kinh nghiệm, là người duy nhất được ủy quyền truy cập vào hệ thống RAG về địa điểm du lịch Việt Nam. Có khả năng phân tích sở thích du khách và đề xuất các điểm đến được tối ưu hóa về thời gian và logic di chuyển.",
+            llm=llm,
+            allow_delegation=False,
+            tools=[
+                self.rag_tools.location_search,
+                self.rag_tools.general_search
+            ]
+        )
+
+    def create_task(self, request: str, destination: str, context: dict = None, quantity: int = None) -> Task:
+        """
+        Create location recommendation task with specific quantity handling
+        
+        Args:
+            request: User request describing location preferences
+            destination: Target destination
+            context: The conversation context.
+            quantity: Specific number of location items needed (for itinerary planning)
+        """
+        
+        # Extract quantity from request if not specified
+        if quantity is None:
+            quantity = self._extract_quantity_from_request(request)
+            
+        relevant_history = context.get("relevant_history", "")
+        print(f"Relavant history for location task: {relevant_history}")
+        
+        prefetched_rag = context.get("prefetched_rag", "")
+        if prefetched_rag:
+            search_step = _PREFETCHED_SEARCH_STEP.format(destination=destination, prefetched_rag=prefetched_rag)
+        else:
+            search_step = _TOOL_SEARCH_STEP.format(destination=destination)
+        desc = _LOCATION_TASK.format(relevant_history=relevant_history, request=request, destination=destination,
+                                     quantity=quantity, search_step=search_step)
         
         return Task(
             description=desc,
@@ -114,25 +155,7 @@ class EnhancedLocationAgent:
     
     def _extract_quantity_from_request(self, request: str) -> int:
         """Extract quantity from request, default to 3 if not specified"""
-        
-        # Look for numbers in request
-        numbers = re.findall(r'\d+', request)
-        if numbers:
-            # Use the first reasonable number found
-            for num_str in numbers:
-                num = int(num_str)
-                if 1 <= num <= 20:  # Reasonable range for locations
-                    return num
-        
-        # Default quantity based on request type
-        request_lower = request.lower()
-        
-        if any(word in request_lower for word in ['nhiều', 'đa dạng', 'khác nhau', 'đầy đủ']):
-            return 5
-        elif any(word in request_lower for word in ['ít', 'vài', 'một số', 'chính']):
-            return 2
-        else:
-            return 3  # Default for most location requests
+        return _extract_quantity(request)
     
     def create_simple_task(self, request: str, dest_name: str) -> Task:
         """Backward compatibility method for simple requests"""
@@ -1,33 +1,92 @@
 """
 Memory Agent for tracking conversation history and providing context
 """
-from typing import Dict, List, Optional, Any
-from datetime import datetime
-import json
+from typing import Dict, List, Optional, Any, Tuple
+from collections import defaultdict, deque
+from itertools import islice
+from pathlib import Path
+from threading import Lock, Thread
+import re
+import time
+import orjson
+from core.types import UserContext
+
+# Interactions kept in memory; older ones are folded into a rolling summary
+_HISTORY_SIZE = 256
+
+# Evicted interactions summarized together in one background LLM call
+_SUMMARY_BATCH = 32
+
+# Without an LLM, evicted user queries (clipped) are kept as a plain-text
+# digest of at most this many characters instead
+_DIGEST_QUERY_CHARS = 100
+_DIGEST_CHARS = 1000
+
+_SUMMARY_PROMPT = """Tóm tắt ngắn gọn (tối đa 5 câu) cuộc trò chuyện tư vấn du lịch dưới đây bằng tiếng Việt.
+Giữ lại điểm đến, thời gian, sở thích của khách và các gợi ý chính đã đưa ra.
+
+Tóm tắt trước đó:
+{summary}
+
+Các lượt trò chuyện tiếp theo:
+{turns}"""
+
+# Past interactions of the same intent passed along as relevant history
+_RELEVANT_HISTORY_SIZE = 2
+
+# extracted_info keys copied into the matching UserContext field
+_CONTEXT_FIELDS = (
+    ("destination", "current_destination"),
+    ("trip_length", "current_trip_length"),
+    ("dates", "current_dates"),
+)
+
+# Words that mark a follow-up question, matched as whole words in one pass
+# (a bare substring test made "or" fire on "tour" or "forecast")
+_FOLLOW_UP_INDICATORS = (
+    "còn", "thêm", "khác", "nữa", "other", "more", "also", "additionally",
+    "what about", "how about", "còn gì", "và", "or", "hoặc"
+)
+_FOLLOW_UP_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, _FOLLOW_UP_INDICATORS)) + r')\b')
 
 
 class MemoryAgent:
     """
-    Persistent component that tracks the entire conversation history.
+    Persistent component that tracks the conversation history, summarizing turns that age out.
     Provides relevant context to the OrchestratorAgent for follow-up questions.
     """
     
-    def __init__(self):
-        self.conversation_history: List[Dict[str, Any]] = []
-        self.user_context: Dict[str, Any] = {
-            "current_destination": None,
-            "current_trip_length": None,
-            "current_dates": None,
-            "preferences": {},
-            "last_intent": None,
-            "last_results": {}
-        }
+    def __init__(self, llm=None):
+        self.llm = llm
+        self.conversation_history: deque = deque(maxlen=_HISTORY_SIZE)
+        self.user_context = UserContext()
+        # Most recent interactions per intent, kept up to date by add_interaction
+        self._history_by_intent: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=_RELEVANT_HISTORY_SIZE)
+        )
+        # Interactions not yet written to every .jsonl history log in use,
+        # starting at interaction number _pending_base; None until a log is in
+        # use, so sessions that never save don't accumulate them
+        self._pending_log: Optional[List[Dict[str, Any]]] = None
+        self._pending_base = 0
+        # Interactions already written, per history log path
+        self._log_marks: Dict[str, int] = {}
+        # Total interactions, including those evicted from the ring buffer
+        self._interaction_count = 0
+        # LLM summary of evicted interactions, refreshed in the background
+        self.rolling_summary = ""
+        self._evicted: List[Dict[str, Any]] = []
+        self._summary_lock = Lock()
+        # Last get_relevant_context result as ((query, intent), context); any
+        # change to history or user context resets it
+        self._context_cache: Optional[Tuple[Tuple[str, str], Dict[str, Any]]] = None
     
     def add_interaction(self, user_query: str, intent: str, agent_used: str, 
                        result: str, extracted_info: Dict[str, Any] = None):
         """Add a new interaction to the conversation history"""
         interaction = {
-            "timestamp": datetime.now().isoformat(),
+            # Wall-clock nanoseconds; format with datetime.fromtimestamp(ns / 1e9) when shown
+            "timestamp_ns": time.time_ns(),
             "user_query": user_query,
             "intent": intent,
             "agent_used": agent_used,
@@ -35,47 +94,61 @@ class MemoryAgent:
             "extracted_info": extracted_info or {}
         }
         
+        if len(self.conversation_history) == _HISTORY_SIZE:
+            if self.llm is None:
+                self._digest(self.conversation_history[0])
+            else:
+                self._evicted.append(self.conversation_history[0])
+                if len(self._evicted) >= _SUMMARY_BATCH:
+                    batch, self._evicted = self._evicted, []
+                    Thread(target=self._summarize, args=(batch,), daemon=True).start()
         self.conversation_history.append(interaction)
+        self._history_by_intent[intent].append(interaction)
+        self._interaction_count += 1
+        self._context_cache = None
+        if self._pending_log is not None:
+            self._pending_log.append(interaction)
         
         # Update current context
-        if extracted_info:
-            if "destination" in extracted_info:
-                self.user_context["current_destination"] = extracted_info["destination"]
-            if "trip_length" in extracted_info:
-                self.user_context["current_trip_length"] = extracted_info["trip_length"]
-            if "dates" in extracted_info:
-                self.user_context["current_dates"] = extracted_info["dates"]
-            if "preferences" in extracted_info:
-                self.user_context["preferences"].update(extracted_info["preferences"])
-        
-        self.user_context["last_intent"] = intent
-        self.user_context["last_results"][agent_used] = result
+        self._merge_extracted(extracted_info)
+        self.user_context.last_intent = intent
+        self.user_context.last_results[agent_used] = result
+    
+    def _merge_extracted(self, extracted_info: Optional[Dict[str, Any]]):
+        """Copy the trip details found in an interaction into the user context"""
+        if not extracted_info:
+            return
+        for key, field_name in _CONTEXT_FIELDS:
+            if key in extracted_info:
+                setattr(self.user_context, field_name, extracted_info[key])
+        if "preferences" in extracted_info:
+            self.user_context.preferences.update(extracted_info["preferences"])
     
     def get_relevant_context(self, current_query: str, intent: str) -> Dict[str, Any]:
-        """Get relevant context for the current query"""
+        """Get relevant context for the current query; repeated calls within a turn share one result"""
+        key = (current_query, intent)
+        if self._context_cache is not None and self._context_cache[0] == key:
+            return self._context_cache[1]
+        
         context = {
-            "current_context": self.user_context.copy(),
+            "current_context": self.user_context.to_dict(),
             "is_follow_up": self._is_follow_up_question(current_query, intent),
-            "recent_interactions": self.conversation_history[-3:] if self.conversation_history else [],
+            "recent_interactions": list(islice(self.conversation_history, max(len(self.conversation_history) - 3, 0), None)),
             "relevant_history": self._find_relevant_history(current_query, intent)
         }
+        self._context_cache = (key, context)
         
         return context
     
     def _is_follow_up_question(self, query: str, intent: str) -> bool:
         """Determine if this is a follow-up question"""
-        follow_up_indicators = [
-            "còn", "thêm", "khác", "nữa", "other", "more", "also", "additionally",
-            "what about", "how about", "còn gì", "và", "or", "hoặc"
-        ]
-        
         query_lower = query.lower()
-        has_follow_up_words = any(indicator in query_lower for indicator in follow_up_indicators)
+        has_follow_up_words = bool(_FOLLOW_UP_RE.search(query_lower))
         
         # If no specific destination mentioned but we have current context
         has_contextual_reference = (
-            self.user_context["current_destination"] and 
-            self.user_context["current_destination"].lower() not in query_lower
+            self.user_context.current_destination and 
+            self.user_context.current_destination.lower() not in query_lower
         )
         
         # Recent interaction exists
@@ -85,15 +158,33 @@ class MemoryAgent:
     
     def _find_relevant_history(self, query: str, intent: str) -> List[Dict[str, Any]]:
         """Find relevant historical interactions"""
-        relevant = []
-        
-        # Get interactions with same intent
-        for interaction in self.conversation_history:
-            if interaction["intent"] == intent:
-                relevant.append(interaction)
-        
-        # Limit to most recent 2 relevant interactions
-        return relevant[-2:] if relevant else []
+        # Most recent interactions with the same intent
+        return list(self._history_by_intent.get(intent, ()))
+    
+    def _summarize(self, batch: List[Dict[str, Any]]):
+        """Fold a batch of evicted interactions into the rolling summary"""
+        turns = "\n".join(
+            f"- Khách: {interaction['user_query']}\n  {interaction['agent_used']}: {str(interaction['result'])[:300]}"
+            for interaction in batch
+        )
+        # Batches are folded one at a time so each builds on the latest summary
+        with self._summary_lock:
+            try:
+                response = self.llm.invoke(_SUMMARY_PROMPT.format(
+                    summary=self.rolling_summary or "Chưa có", turns=turns
+                ))
+                self.rolling_summary = str(getattr(response, "content", response)).strip()
+            except Exception as e:
+                print(f"⚠️ Could not summarize conversation history: {e}")
+    
+    def _digest(self, interaction: Dict[str, Any]):
+        """Append an evicted user query to the rolling summary when there is no LLM"""
+        query = " ".join(str(interaction["user_query"]).split())[:_DIGEST_QUERY_CHARS]
+        summary = f"{self.rolling_summary}; {query}" if self.rolling_summary else query
+        if len(summary) > _DIGEST_CHARS:
+            # Drop the oldest queries, never leaving half of one behind
+            summary = summary[-_DIGEST_CHARS:].split("; ", 1)[-1]
+        self.rolling_summary = summary
     
     def get_conversation_summary(self) -> str:
         """Get a summary of the current conversation state"""
@@ -103,54 +194,96 @@ class MemoryAgent:
         context = self.user_context
         summary = f"""
 📝 Tóm tắt cuộc trò chuyện:
-🎯 Điểm đến hiện tại: {context['current_destination'] or 'Chưa xác định'}
-📅 Thời gian dự kiến: {context['current_trip_length'] or 'Chưa xác định'} ngày
-📆 Ngày khởi hành: {context['current_dates'] or 'Chưa xác định'}
-🎨 Sở thích đã biết: {', '.join(context['preferences'].keys()) if context['preferences'] else 'Chưa có'}
-🔄 Yêu cầu gần nhất: {context['last_intent'] or 'Chưa có'}
-💬 Tổng số tương tác: {len(self.conversation_history)}
+🎯 Điểm đến hiện tại: {context.current_destination or 'Chưa xác định'}
+📅 Thời gian dự kiến: {context.current_trip_length or 'Chưa xác định'} ngày
+📆 Ngày khởi hành: {context.current_dates or 'Chưa xác định'}
+🎨 Sở thích đã biết: {', '.join(context.preferences.keys()) if context.preferences else 'Chưa có'}
+🔄 Yêu cầu gần nhất: {context.last_intent or 'Chưa có'}
+💬 Tổng số tương tác: {self._interaction_count}
 """
+        if self.rolling_summary:
+            summary += f"🧾 Các lượt trước: {self.rolling_summary}\n"
         return summary.strip()
     
     def clear_context(self):
         """Clear current context while keeping history"""
-        self.user_context = {
-            "current_destination": None,
-            "current_trip_length": None,
-            "current_dates": None,
-            "preferences": {},
-            "last_intent": None,
-            "last_results": {}
-        }
+        self.user_context = UserContext()
+        self._context_cache = None
+    
+    def clear_all(self):
+        """Clear current context and conversation history"""
+        self.clear_context()
+        self.conversation_history.clear()
+        self._history_by_intent.clear()
+        self._interaction_count = 0
+        with self._summary_lock:
+            self.rolling_summary = ""
+        self._evicted = []
+        self._pending_log = None
+        self._log_marks.clear()
+    
+    def append_interaction(self, filepath: str):
+        """Append interactions not yet logged to the filepath.jsonl history log"""
+        count = self._interaction_count
+        if self._pending_log is None:
+            # First save of this session: everything still in memory is new
+            self._pending_log = list(self.conversation_history)
+            self._pending_base = count - len(self._pending_log)
+        history_start = count - len(self.conversation_history)
+        # A log not written this session gets every interaction still known
+        start = self._log_marks.get(filepath, min(self._pending_base, history_start))
+        if start >= self._pending_base:
+            records = self._pending_log[start - self._pending_base:]
+        else:
+            records = list(self.conversation_history)
+        if records:
+            with open(filepath + ".jsonl", 'ab') as f:
+                f.write(b"".join(orjson.dumps(interaction) + b"\n" for interaction in records))
+        self._log_marks[filepath] = count
+        # Keep only what some log has not received yet
+        done = min(self._log_marks.values())
+        del self._pending_log[:done - self._pending_base]
+        self._pending_base = done
     
     def save_to_file(self, filepath: str):
-        """Save conversation history to file"""
-        data = {
-            "conversation_history": self.conversation_history,
-            "user_context": self.user_context
-        }
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """Save conversation history to filepath.jsonl and the user context to filepath"""
+        self.append_interaction(filepath)
+        Path(filepath).write_bytes(orjson.dumps(
+            {"user_context": self.user_context.to_dict(), "rolling_summary": self.rolling_summary},
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ))
     
     def load_from_file(self, filepath: str):
         """Load conversation history from file"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.conversation_history = data.get("conversation_history", [])
-            self.user_context = data.get("user_context", {
-                "current_destination": None,
-                "current_trip_length": None,
-                "current_dates": None,
-                "preferences": {},
-                "last_intent": None,
-                "last_results": {}
-            })
+            data = orjson.loads(Path(filepath).read_bytes())
         except FileNotFoundError:
-            pass  # Keep empty history if file doesn't exist
+            return  # Keep empty history if file doesn't exist
+        # Snapshots written before the history log carry the history inline;
+        # it is moved to the log on the next save
+        self.rolling_summary = data.get("rolling_summary", "")
+        inline_history = data.get("conversation_history", [])
+        self.conversation_history = deque(inline_history, maxlen=_HISTORY_SIZE)
+        self._interaction_count = len(inline_history)
+        try:
+            with open(filepath + ".jsonl", 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        self.conversation_history.append(orjson.loads(line))
+                        self._interaction_count += 1
+        except FileNotFoundError:
+            pass
+        # The loaded log already holds everything but the inline history
+        self._pending_log = list(inline_history)
+        self._pending_base = self._interaction_count - len(inline_history)
+        self._log_marks = {filepath: self._pending_base}
+        self._history_by_intent.clear()
+        for interaction in self.conversation_history:
+            self._history_by_intent[interaction["intent"]].append(interaction)
+        self.user_context = UserContext(**data.get("user_context", {}))
+        self._context_cache = None
     
     def update_user_preferences(self, preferences: Dict[str, Any]):
         """Update user preferences in the current context."""
-        if not self.user_context.get("preferences"):
-            self.user_context["preferences"] = {}
-        self.user_context["preferences"].update(preferences)
+        self.user_context.preferences.update(preferences)
+        self._context_cache = None
@@ -3,6 +3,9 @@ Multi-Agent Travel Assistant System
 Sophisticated orchestrator with intent classification and context-aware routing
 """
 import os
+import re
+import atexit
+import httpx
 from crewai import Crew, Process
 from agents.location_agent import EnhancedLocationAgent
 from agents.food_agent import EnhancedFoodAgent
@@ -10,13 +13,53 @@ from agents.itinerary_agent import AdvancedItineraryAgent
 from agents.booking_agent import BookingAgent
 from agents.default_agent import DefaultAgent
 from agents.memory_agent import MemoryAgent
-from tools.rag_tools import TravelRAGTools
+from tools.rag_tools import TravelRAGTools, shared_rag_tools
 from tools.vector_store import TravelRAGSystem
-from data.travel_data import TRAVEL_DATA
-from core.config import settings
+from core.config import settings, setup_logging
+from core.semantic_cache import SemanticCache
 from core.utils import classify_intent, detect_destination, extract_preferences
 from langchain_openai import ChatOpenAI
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from threading import Lock
+from functools import lru_cache
+
+# One keep-alive connection pool to api.openai.com shared by every LLM client,
+# so agents on different models don't each pay for their own TLS setup
+_OPENAI_HTTP_CLIENT = httpx.Client(
+    timeout=httpx.Timeout(600.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60)
+)
+
+# Intents whose answers are reused for paraphrased queries. Itineraries and
+# hotel searches keep their own caches; weather is always fetched fresh, and
+# general chat ("other") depends too much on the conversation to reuse
+_CACHEABLE_INTENTS = frozenset({"eat", "visit"})
+
+# Cached answers older than a day are regenerated
+_RESPONSE_CACHE_TTL = 24 * 3600
+
+# Characters of each answer kept in conversation memory; the ring buffer in
+# MemoryAgent bounds how many of these previews are alive at once
+_MEMORY_RESULT_CHARS = 500
+
+# Numbers in a query (dish counts, days, dates) must match for a cache hit
+_QUERY_NUMBERS_RE = re.compile(r'\d+')
+
+
+@lru_cache(maxsize=1)
+def _shared_components() -> Tuple[TravelRAGSystem, TravelRAGTools, SemanticCache]:
+    """Process-wide RAG system, tools and response cache, built on first use"""
+    rag_tools = shared_rag_tools()
+    rag_system = rag_tools.rag_system
+    
+    # Semantic cache of final answers, embedded with the RAG embedding model
+    response_cache = SemanticCache(
+        rag_system.embeddings, threshold=0.95, ttl=_RESPONSE_CACHE_TTL
+    )
+    cache_path = settings.get("semantic_cache_path", "semantic_cache/responses")
+    response_cache.load(cache_path)
+    atexit.register(response_cache.save, cache_path)
+    return rag_system, rag_tools, response_cache
 
 
 class MultiAgentTravelOrchestrator:
@@ -26,31 +69,35 @@ class MultiAgentTravelOrchestrator:
     """
     
     def __init__(self):
-        # Initialize RAG system
-        self.rag_system = TravelRAGSystem(
-            settings["rag_config"], 
-            settings["chroma_path"], 
-            TRAVEL_DATA
-        )
-        self.rag_system.setup_vectorstore(force_rebuild=False)
-        self.rag_tools = TravelRAGTools(self.rag_system)
+        # RAG system and response cache are shared by every orchestrator
+        self.rag_system, self.rag_tools, self.response_cache = _shared_components()
         
         # Initialize LLMs
-        self.llm_gpt35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3)
-        self.llm_gpt4 = ChatOpenAI(model="gpt-4o-mini", temperature=0.25)
+        # LLM_TIER: the planner model writes final itineraries only; the cheap
+        # model handles clarification, cached-plan adaptation and the
+        # food/location/booking/general agents
+        self.llm_gpt35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3, http_client=_OPENAI_HTTP_CLIENT)
+        self.llm_gpt4 = ChatOpenAI(model="gpt-4o-mini", temperature=0.25, http_client=_OPENAI_HTTP_CLIENT)
         
         # Initialize Memory Agent
-        self.memory_agent = MemoryAgent()
+        self.memory_agent = MemoryAgent(llm=self.llm_gpt35)
         
         # Initialize specialist agents
         self.food_agent = EnhancedFoodAgent(self.llm_gpt35, self.rag_tools)
         self.location_agent = EnhancedLocationAgent(self.llm_gpt35, self.rag_tools)
         self.itinerary_agent = AdvancedItineraryAgent(
-            self.llm_gpt4, self.rag_tools, self.food_agent, self.location_agent
+            self.llm_gpt4, self.rag_tools, self.food_agent, self.location_agent,
+            llm_helper=self.llm_gpt35
         )
         self.booking_agent = BookingAgent(self.llm_gpt35)
         self.default_agent = DefaultAgent(self.llm_gpt35)
         
+        # Idle Crews per agent, reused with the next task swapped in. A query
+        # checks one out for its kickoff, so concurrent queries never share
+        # a Crew; the lock only guards the pool itself
+        self._crews: Dict[int, List[Crew]] = {}
+        self._crews_lock = Lock()
+        
         print("🤖 Multi-Agent Travel Assistant System initialized successfully!")
     
     def process_query(self, user_query: str) -> str:
@@ -66,14 +113,87 @@ class MultiAgentTravelOrchestrator:
 
         # Step 2: Get relevant context from memory
         context = self.memory_agent.get_relevant_context(user_query, intent)
-        print(f"📚 Context analysis: {'Follow-up' if context.get('is_follow_up') else 'New query'}")        # Step 3: Route to appropriate agent
-        response = self._route_to_agent(user_query, intent, context)
+        print(f"📚 Context analysis: {'Follow-up' if context.get('is_follow_up') else 'New query'}")
+        
+        # Parse destination and preferences once for the cache, handlers and memory
+        self._parse_query(user_query, context)
+        
+        # Step 3: Route to appropriate agent, unless a paraphrase was answered before
+        scope_key = self._response_scope(user_query, intent, context)
+        response = self._cached_response(user_query, scope_key)
+        if response is None:
+            response = self._route_to_agent(user_query, intent, context)
+            self._store_response(user_query, scope_key, response)
 
         # Step 4: Update memory with interaction
         self._update_memory(user_query, intent, response, context)
 
         return response
     
+    def _parse_query(self, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Destination and preferences of the query, parsed once per turn into context["_parsed"]"""
+        parsed = context.get("_parsed")
+        if parsed is None:
+            parsed = context["_parsed"] = {
+                "destination": detect_destination(query),
+                "preferences": extract_preferences(query)
+            }
+        return parsed
+    
+    def _response_scope(self, query: str, intent: str, context: Dict[str, Any]) -> Optional[str]:
+        """Scope key for the response cache, or None if the answer must not be cached"""
+        # The cache is shared by every user, so only answers built from the
+        # query alone are stored: follow-ups and queries whose prompt carries
+        # this user's earlier turns (relevant_history) are never cached
+        if (intent not in _CACHEABLE_INTENTS or context.get("is_follow_up")
+                or context.get("relevant_history")):
+            return None
+        destination = self._parse_query(query, context)["destination"] or context.get("current_context", {}).get("current_destination")
+        numbers = ",".join(_QUERY_NUMBERS_RE.findall(query))
+        return f"{intent}|{destination}|{numbers}"
+    
+    def _cached_response(self, query: str, scope_key: Optional[str]) -> Optional[str]:
+        """Previously generated answer for a similar query in the same scope"""
+        if scope_key is None:
+            return None
+        try:
+            cached = self.response_cache.get(query, scope_key)
+        except Exception as e:
+            print(f"⚠️ Response cache lookup failed: {e}")
+            return None
+        if cached is not None:
+            print("♻️ Serving cached response")
+        return cached
+    
+    def _store_response(self, query: str, scope_key: Optional[str], response: str):
+        """Remember a successful answer in the response cache"""
+        if scope_key is None or response.startswith("Xin lỗi"):
+            return
+        try:
+            self.response_cache.put(query, scope_key, response)
+        except Exception as e:
+            print(f"⚠️ Response cache update failed: {e}")
+    
+    def _kickoff(self, task):
+        """Run a task on an idle pooled Crew of its agent, building one if none is free"""
+        key = id(task.agent)
+        with self._crews_lock:
+            idle = self._crews.setdefault(key, [])
+            crew = idle.pop() if idle else None
+        if crew is None:
+            crew = Crew(
+                agents=[task.agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=False
+            )
+        crew.tasks = [task]
+        try:
+            return crew.kickoff()
+        finally:
+            with self._crews_lock:
+                idle.append(crew)
+    
     def _route_to_agent(self, query: str, intent: str, context: Dict[str, Any]) -> str:
         """
         Route query to appropriate agent based on intent and context
@@ -99,7 +219,7 @@ class MultiAgentTravelOrchestrator:
         """Handle food-related queries using FoodAgent"""
         print("🍽️ Routing to FoodAgent...")
         # Extract or use context destination
-        destination = detect_destination(query)
+        destination = self._parse_query(query, context)["destination"]
         print(f"🔍 Detected destination from query: {destination}")
         if not destination and context.get("current_context", {}).get("current_destination"):
             destination = context["current_context"]["current_destination"]
@@ -113,21 +233,14 @@ class MultiAgentTravelOrchestrator:
         
         # Create and execute food task
         task = self.food_agent.create_task(query, destination, context)
-        crew = Crew(
-            agents=[self.food_agent.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=False
-        )
-        
-        result = crew.kickoff()
+        result = self._kickoff(task)
         return f"🍜 **GỢI Ý ẨM THỰC TẠI {destination.upper()}**\n\n{str(result)}"
     
     def _handle_location_query(self, query: str, context: Dict[str, Any]) -> str:
         """Handle location/attraction queries using LocationAgent"""
         print("🏛️ Routing to LocationAgent...")
           # Extract or use context destination
-        destination = detect_destination(query)
+        destination = self._parse_query(query, context)["destination"]
         if not destination and context.get("current_context", {}).get("current_destination"):
             destination = context["current_context"]["current_destination"]
             print(f"📍 Using context destination: {destination}")
@@ -138,50 +251,25 @@ class MultiAgentTravelOrchestrator:
         
         # Create and execute location task
         task = self.location_agent.create_task(query, destination, context)
-        crew = Crew(
-            agents=[self.location_agent.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=False
-        )
-        
-        result = crew.kickoff()
+        result = self._kickoff(task)
         return f"🗺️ **ĐỊA ĐIỂM THAM QUAN TẠI {destination.upper()}**\n\n{str(result)}"
     
     def _handle_itinerary_query(self, query: str, context: Dict[str, Any]) -> str:
         """Handle itinerary planning using AdvancedItineraryAgent"""
         print("📅 Routing to AdvancedItineraryAgent...")
         
+        # Vague requests without a destination get a near-static reply
+        cached = self.itinerary_agent.cached_response(query, context)
+        if cached is not None:
+            print("♻️ Reusing cached reply for request without destination")
+            return f"📋 **LỊCH TRÌNH DU LỊCH CHI TIẾT**\n\n{cached}"
+        
         # The ItineraryAgent handles its own parameter extraction and resource gathering
         task = self.itinerary_agent.create_task(query, context)
         
-        # Check if we need to gather resources first
-        destination = detect_destination(query)
-        if destination:
-            print(f"🔄 Complex itinerary planning for {destination}...")
-            
-            # The ItineraryAgent will internally call FoodAgent and LocationAgent
-            # This is handled in its create_task method
-            crew = Crew(
-                agents=[
-                    self.itinerary_agent.agent,
-                    self.food_agent.agent,
-                    self.location_agent.agent
-                ],
-                tasks=[task],
-                process=Process.sequential,
-                verbose=False
-            )
-        else:
-            # Simple case or need destination clarification
-            crew = Crew(
-                agents=[self.itinerary_agent.agent],
-                tasks=[task],
-                process=Process.sequential,
-                verbose=False
-            )
-        
-        result = crew.kickoff()
+        # Resources from FoodAgent and LocationAgent were gathered inside
+        # create_task, so the task only needs its own agent
+        result = self._kickoff(task)
         return f"📋 **LỊCH TRÌNH DU LỊCH CHI TIẾT**\n\n{str(result)}"
     
     def _handle_booking_query(self, query: str, context: Dict[str, Any]) -> str:
@@ -189,14 +277,7 @@ class MultiAgentTravelOrchestrator:
         print("🏨 Routing to BookingAgent...")
         
         task = self.booking_agent.create_task(query, context)
-        crew = Crew(
-            agents=[self.booking_agent.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=False
-        )
-        
-        result = crew.kickoff()
+        result = self._kickoff(task)
         return f"🏨 **THÔNG TIN KHÁCH SẠN & ĐẶT PHÒNG**\n\n{str(result)}"
     
     def _handle_general_query(self, query: str, context: Dict[str, Any]) -> str:
@@ -204,14 +285,7 @@ class MultiAgentTravelOrchestrator:
         print("🤖 Routing to DefaultAgent...")
         
         task = self.default_agent.create_task(query, context)
-        crew = Crew(
-            agents=[self.default_agent.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=False
-        )
-        
-        result = crew.kickoff()
+        result = self._kickoff(task)
         return f"💡 **THÔNG TIN DU LỊCH TỔNG QUÁT**\n\n{str(result)}"
     
     def _handle_weather_query(self, query: str, context: Dict[str, Any]) -> str:
@@ -219,7 +293,7 @@ class MultiAgentTravelOrchestrator:
         print("🌤️ Routing to Weather Service...")
         
         # Extract destination from query or context
-        destination = detect_destination(query)
+        destination = self._parse_query(query, context)["destination"]
         if not destination and context.get("current_context", {}).get("current_destination"):
             destination = context["current_context"]["current_destination"]
             print(f"📍 Using context destination: {destination}")
@@ -244,13 +318,13 @@ class MultiAgentTravelOrchestrator:
     def _update_memory(self, query: str, intent: str, response: str, context: Dict[str, Any]):
         """Update memory with current interaction"""
         # Extract key information for context
-        destination = detect_destination(query)
+        destination = self._parse_query(query, context)["destination"]
         
         # Don't overwrite existing destination if current query doesn't specify one
         if not destination and context.get("current_context", {}).get("current_destination"):
             destination = context["current_context"]["current_destination"]
         
-        preferences = extract_preferences(query)
+        preferences = self._parse_query(query, context)["preferences"]
         
         interaction_context = {
             "destination": destination,
@@ -272,7 +346,7 @@ class MultiAgentTravelOrchestrator:
             user_query=query,
             intent=intent,
             agent_used=agent_used,
-            result=response[:500] + "..." if len(response) > 500 else response,  # Truncate for memory
+            result=response[:_MEMORY_RESULT_CHARS] + "..." if len(response) > _MEMORY_RESULT_CHARS else response,
             extracted_info=interaction_context
         )
         
@@ -336,11 +410,14 @@ def run_simple_query(user_query: str) -> str:
     """
     Simple function for backward compatibility with existing code
     """
+    setup_logging()
     orchestrator = MultiAgentTravelOrchestrator()
     return orchestrator.process_query(user_query)
 
 
 if __name__ == "__main__":
+    setup_logging()
+    
     # Run interactive mode
     orchestrator = MultiAgentTravelOrchestrator()
     orchestrator.run_interactive()
@@ -1,21 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+from cachetools import TTLCache
 from crewai import Crew, Process
 from agents.location_agent import EnhancedLocationAgent
 from agents.food_agent import EnhancedFoodAgent
 from agents.itinerary_agent import EnhancedItineraryAgent
-from tools.rag_tools import TravelRAGTools
-from tools.vector_store import TravelRAGSystem
-from data.travel_data import TRAVEL_DATA
-from core.config import settings
+from tools.rag_tools import shared_rag_tools
+from core.utils import extract_days, extract_preferences
 from langchain_openai import ChatOpenAI
 
+# Finished reports keyed by (destination, trip length, preferences), so a
+# repeated request skips all three LLM calls; kept for an hour
+_REPORT_CACHE = TTLCache(maxsize=128, ttl=3600)
+_REPORT_CACHE_LOCK = Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_shared_components():
+    """RAG system, tools and LLMs built once per process and shared by every orchestrator"""
+    rag_tools = shared_rag_tools()
+
+    llm35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3)
+    llm4 = ChatOpenAI(model="gpt-4o-mini", temperature=0.25)
+    return rag_tools.rag_system, rag_tools, llm35, llm4
+
+
 class EnhancedTravelOrchestrator:
     def __init__(self):
-        self.rag_system = TravelRAGSystem(settings["rag_config"], settings["chroma_path"], TRAVEL_DATA)
-        self.rag_system.setup_vectorstore(force_rebuild=False)
-        self.rag_tools = TravelRAGTools(self.rag_system)
-
-        self.llm35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3)
-        self.llm4 = ChatOpenAI(model="gpt-4o-mini", temperature=0.25)
+        self.rag_system, self.rag_tools, self.llm35, self.llm4 = _get_shared_components()
 
         self.loc_agent = EnhancedLocationAgent(self.llm35, self.rag_tools)
         self.food_agent = EnhancedFoodAgent(self.llm35, self.rag_tools)
@@ -42,14 +55,26 @@ class EnhancedTravelOrchestrator:
 
         print(f"📍 Đã nhận diện điểm đến: {dest_name}")
 
+        cache_key = (dest_key, extract_days(user_request),
+                     frozenset(extract_preferences(user_request).items()))
+        with _REPORT_CACHE_LOCK:
+            cached = _REPORT_CACHE.get(cache_key)
+        if cached is not None:
+            print("♻️ Dùng lại kết quả đã tạo cho yêu cầu tương tự")
+            return cached
+
         print("🔍 Phase 1: Tìm kiếm địa điểm và ẩm thực...")
-        t_loc = self.loc_agent.create_task(user_request, dest_name)
-        t_food = self.food_agent.create_task(user_request, dest_name)
+        t_loc = self.loc_agent.create_task(user_request, dest_name, {})
+        t_food = self.food_agent.create_task(user_request, dest_name, {})
 
-        crew1 = Crew(agents=[self.loc_agent.agent, self.food_agent.agent], 
-                     tasks=[t_loc, t_food], 
-                     process=Process.sequential)
-        crew1_results = crew1.kickoff()
+        # The two tasks don't depend on each other, so run one single-agent
+        # crew each side by side: Phase 1 takes max(location, food) time
+        loc_crew = Crew(agents=[self.loc_agent.agent], tasks=[t_loc], process=Process.sequential)
+        food_crew = Crew(agents=[self.food_agent.agent], tasks=[t_food], process=Process.sequential)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            loc_future = pool.submit(loc_crew.kickoff)
+            food_future = pool.submit(food_crew.kickoff)
+            crew1_results = (loc_future.result(), food_future.result())
         print(f"Crew 1 kickoff results: {crew1_results}")
 
         loc_out = str(t_loc.output) if t_loc.output else "Không có dữ liệu."
@@ -69,9 +94,12 @@ class EnhancedTravelOrchestrator:
         crew2_results = crew2.kickoff()
         print(f"Crew 2 kickoff results: {crew2_results}")
 
-        return (
+        report = (
             f"🎯 **KẾT QUẢ CHO: {dest_name.upper()}**\n\n"
             f"=== 🗺️ ĐỊA ĐIỂM ===\n{loc_out}\n\n"
             f"=== 🍜 ẨM THỰC ===\n{food_out}\n\n"
             f"=== 📅 LỊCH TRÌNH ===\n{str(t_itin.output)}"
-        )
\ No newline at end of file
+        )
+        with _REPORT_CACHE_LOCK:
+            _REPORT_CACHE[cache_key] = report
+        return report
\ No newline at end of file
@@ -1,5 +1,9 @@
 import yaml
 import os
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Construct the path to settings.yaml relative to this file's location
 # This makes the path independent of the current working directory
@@ -7,4 +11,31 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 settings_path = os.path.join(project_root, "configs", "settings.yaml")
 
 with open(settings_path, "r") as f:
-    settings = yaml.safe_load(f)
\ No newline at end of file
+    settings = yaml.safe_load(f)
+
+
+_log_listener = None
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """
+    Route log records through a queue so request threads never block on
+    stderr; a single background listener thread does the actual writes.
+    Safe to call more than once; the listener is stopped at exit so
+    queued records are flushed.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    
+    _log_listener = QueueListener(log_queue, handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
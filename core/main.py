@@ -2,12 +2,14 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from agents.multi_agent_orchestrator import MultiAgentTravelOrchestrator
+from core.config import setup_logging
 
 def main():
     """
     Main entry point for the Multi-Agent Travel Assistant System
     """
     print("🚀 Starting Multi-Agent Travel Assistant System...")
+    setup_logging()
     
     # Initialize the sophisticated orchestrator
     orchestrator = MultiAgentTravelOrchestrator()
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+from threading import Lock
+from typing import List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Response cache looked up by embedding similarity within a scope key.
+    Embeddings are kept L2-normalized in one matrix, so a lookup is a single
+    matrix-vector product; once max_entries is reached the oldest row is reused.
+    """
+
+    def __init__(self, embedder, threshold: float = 0.95, max_entries: int = 10_000,
+                 ttl: Optional[float] = None):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: List[str] = []
+        self._responses: List[str] = []
+        self._stamps: List[float] = []
+        self._next = 0
+        # get() and put() for the same query share one embedding call
+        self._last_query: Optional[str] = None
+        self._last_vector: Optional[np.ndarray] = None
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Normalized embedding of a query"""
+        with self._lock:
+            if query == self._last_query:
+                return self._last_vector
+        vector = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        with self._lock:
+            self._last_query, self._last_vector = query, vector
+        return vector
+
+    def get(self, query: str, scope_key: str) -> Optional[str]:
+        """Cached response for the most similar query in the same scope, or None"""
+        if not self._responses:
+            return None
+        vector = self._embed(query)
+        now = time.time()
+        with self._lock:
+            count = len(self._responses)
+            sims = self._vectors[:count] @ vector
+            candidates = np.flatnonzero(sims >= self.threshold)
+            for i in candidates[np.argsort(-sims[candidates])]:
+                if self._scopes[i] != scope_key:
+                    continue
+                if self.ttl is not None and now - self._stamps[i] > self.ttl:
+                    continue
+                return self._responses[i]
+        return None
+
+    def put(self, query: str, scope_key: str, response: str):
+        """Store a response for a query"""
+        vector = self._embed(query)
+        with self._lock:
+            count = len(self._responses)
+            if self._vectors is None:
+                self._vectors = np.empty((min(64, self.max_entries), vector.size), dtype=np.float32)
+            if count < self.max_entries:
+                if count == len(self._vectors):
+                    grown = np.empty((min(2 * count, self.max_entries), vector.size), dtype=np.float32)
+                    grown[:count] = self._vectors
+                    self._vectors = grown
+                row = count
+                self._scopes.append(scope_key)
+                self._responses.append(response)
+                self._stamps.append(time.time())
+            else:
+                row = self._next
+                self._next = (row + 1) % self.max_entries
+                self._scopes[row] = scope_key
+                self._responses[row] = response
+                self._stamps[row] = time.time()
+            self._vectors[row] = vector
+
+    def save(self, path: str):
+        """Write the cache to path.npy (embeddings) and path.json (entries)"""
+        with self._lock:
+            if not self._responses:
+                return
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            np.save(path + ".npy", self._vectors[:len(self._responses)])
+            with open(path + ".json", "w", encoding="utf-8") as f:
+                json.dump({
+                    "scopes": self._scopes,
+                    "responses": self._responses,
+                    "stamps": self._stamps,
+                    "next": self._next
+                }, f, ensure_ascii=False)
+
+    def load(self, path: str):
+        """Restore a cache written by save(); a missing file leaves it empty"""
+        if not (os.path.exists(path + ".npy") and os.path.exists(path + ".json")):
+            return
+        vectors = np.load(path + ".npy")
+        with open(path + ".json", encoding="utf-8") as f:
+            entries = json.load(f)
+        count = min(len(entries["responses"]), self.max_entries)
+        with self._lock:
+            self._vectors = np.empty((max(count, 1), vectors.shape[1]), dtype=np.float32)
+            self._vectors[:count] = vectors[:count]
+            self._scopes = entries["scopes"][:count]
+            self._responses = entries["responses"][:count]
+            self._stamps = entries["stamps"][:count]
+            self._next = entries["next"] % self.max_entries if count == self.max_entries else 0
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any
+
+
+@dataclass(slots=True, frozen=True)
+class PlanParams:
+    """Parameters extracted from an itinerary request"""
+    destination: Optional[str]
+    trip_length: Optional[int]
+    time_info: Optional[Dict[str, Any]]
+    preferences: Dict[str, Any]
+
+
+@dataclass(slots=True, frozen=True)
+class ResourceReq:
+    """Number of food and location items an itinerary needs"""
+    food_items: int
+    location_items: int
+
+
+@dataclass(slots=True, frozen=True)
+class Resources:
+    """Food and location recommendations gathered for an itinerary"""
+    food_info: str
+    location_info: str
+
+
+@dataclass(slots=True)
+class UserContext:
+    """What the conversation has established so far about the user's trip"""
+    current_destination: Optional[str] = None
+    current_trip_length: Optional[int] = None
+    current_dates: Optional[Any] = None
+    preferences: Dict[str, Any] = field(default_factory=dict)
+    last_intent: Optional[str] = None
+    last_results: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict copy for agents that read the context by key"""
+        return {name: getattr(self, name) for name in self.__slots__}
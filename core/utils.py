@@ -1,6 +1,7 @@
 import re
 from thefuzz import fuzz, process
 import dateparser
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict, Any
 
@@ -47,10 +48,14 @@ VIETNAMESE_NUMBERS = {
     "một mươi": 10, "hai mơi": 20, "ba mười": 30
 }
 
+# Trip length written with digits ("3 ngày", "2 days")
+_DAYS_RE = re.compile(r'(\d+)\s*(ngày|day)', re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
 def extract_days(request: str, default_days: int = 2) -> int:
     """Extract trip length from request with better handling"""
     # First try to find digits
-    digit_match = re.search(r'(\d+)\s*(ngày|day)', request, re.IGNORECASE)
+    digit_match = _DAYS_RE.search(request)
     if digit_match:
         return int(digit_match.group(1))
     
@@ -62,6 +67,39 @@ def extract_days(request: str, default_days: int = 2) -> int:
     
     return default_days
 
+# Generic location words that should not be used for destination detection
+_GENERIC_WORDS = frozenset({
+    "ở đó", "đó", "đây", "này", "kia", "nơi", "chỗ", "tại", "ở", "trong", 
+    "tại đây", "tại đó", "ở đây", "ở kia", "nơi này", "nơi đó", "chỗ này", "chỗ đó"
+})
+
+# Common Vietnamese words that should NOT be considered destinations
+_COMMON_WORDS = frozenset({
+    "đi", "về", "thì", "sao", "gì", "như", "thế", "nào", "có", "là", "của", 
+    "một", "hai", "ba", "bốn", "năm", "sáu", "bảy", "tám", "chín", "mười",
+    "ngày", "tuần", "tháng", "năm", "thời", "gian", "lịch", "trình", "chuyến",
+    "tour", "du", "lịch", "phải", "nên", "cần", "muốn", "thích", "tốt",
+    "đẹp", "hay", "nhỉ", "không", "chưa", "rồi", "xong", "được", "bao",
+    "nhiều", "lâu", "xa", "gần", "to", "nhỏ", "lớn", "bé", "cao", "thấp"
+})
+
+# Any generic or common word inside a fuzzy candidate rules it out; one
+# alternation replaces the per-word substring checks
+_NON_DESTINATION_RE = re.compile("|".join(map(re.escape, _GENERIC_WORDS | _COMMON_WORDS)))
+
+# Every destination name and alias -> (dict order, canonical name)
+_DESTINATION_PRIORITY = {}
+for _rank, (_canonical, _aliases) in enumerate(VIETNAMESE_DESTINATIONS.items()):
+    for _name in (_canonical, *_aliases):
+        _DESTINATION_PRIORITY.setdefault(_name, (_rank, _canonical))
+_ALL_DESTINATION_NAMES = list(_DESTINATION_PRIORITY)
+
+# One pass over the query for all names; the lookahead reports overlapping
+# hits and longer names win at the same position
+_DESTINATION_RE = re.compile(
+    "(?=(" + "|".join(map(re.escape, sorted(_DESTINATION_PRIORITY, key=len, reverse=True))) + "))"
+)
+
 def detect_destination(query: str) -> Optional[str]:
     """
     Robustly identify Vietnamese destination with fuzzy matching.
@@ -69,36 +107,13 @@ def detect_destination(query: str) -> Optional[str]:
     """
     query_lower = query.lower()
     
-    # Generic location words that should not be used for destination detection
-    generic_words = {
-        "ở đó", "đó", "đây", "này", "kia", "nơi", "chỗ", "tại", "ở", "trong", 
-        "tại đây", "tại đó", "ở đây", "ở kia", "nơi này", "nơi đó", "chỗ này", "chỗ đó"
-    }
-    
-    # Common Vietnamese words that should NOT be considered destinations
-    common_words = {
-        "đi", "về", "thì", "sao", "gì", "như", "thế", "nào", "có", "là", "của", 
-        "một", "hai", "ba", "bốn", "năm", "sáu", "bảy", "tám", "chín", "mười",
-        "ngày", "tuần", "tháng", "năm", "thời", "gian", "lịch", "trình", "chuyến",
-        "tour", "du", "lịch", "phải", "nên", "cần", "muốn", "thích", "tốt",
-        "đẹp", "hay", "nhỉ", "không", "chưa", "rồi", "xong", "được", "bao",
-        "nhiều", "lâu", "xa", "gần", "to", "nhỏ", "lớn", "bé", "cao", "thấp"
-    }
-    
-    # Direct match first
-    for canonical, aliases in VIETNAMESE_DESTINATIONS.items():
-        if canonical in query_lower:
-            return canonical
-        for alias in aliases:
-            if alias in query_lower:
-                return canonical
+    # Direct match first: the earliest destination in VIETNAMESE_DESTINATIONS
+    # order whose name or alias occurs anywhere in the query
+    hits = [_DESTINATION_PRIORITY[m.group(1)] for m in _DESTINATION_RE.finditer(query_lower)]
+    if hits:
+        return min(hits)[1]
     
     # Fuzzy matching for misspellings - but exclude generic and common words
-    all_destinations = []
-    for canonical, aliases in VIETNAMESE_DESTINATIONS.items():
-        all_destinations.append(canonical)
-        all_destinations.extend(aliases)
-    
     # Extract potential destination words (2-3 word combinations)
     words = query_lower.split()
     for i in range(len(words)):
@@ -106,10 +121,7 @@ def detect_destination(query: str) -> Optional[str]:
             candidate = " ".join(words[i:j])
             
             # Skip generic location words and common Vietnamese words
-            if (candidate in generic_words or 
-                candidate in common_words or
-                any(generic in candidate for generic in generic_words) or
-                any(common in candidate for common in common_words)):
+            if _NON_DESTINATION_RE.search(candidate):
                 continue
                 
             # Skip very short candidates (single letters or two letters)
@@ -120,12 +132,9 @@ def detect_destination(query: str) -> Optional[str]:
             if candidate.isdigit():
                 continue
                 
-            match, score = process.extractOne(candidate, all_destinations)
+            match, score = process.extractOne(candidate, _ALL_DESTINATION_NAMES)
             if score >= 99:  # Very high threshold to reduce false positives
-                # Find canonical name
-                for canonical, aliases in VIETNAMESE_DESTINATIONS.items():
-                    if match == canonical or match in aliases:
-                        return canonical
+                return _DESTINATION_PRIORITY[match][1]
     
     return None
 
@@ -136,6 +145,29 @@ def detect_trip_length(query: str) -> Optional[int]:
     """
     return extract_days(query, None)
 
+# Common Vietnamese time expressions, checked in order by detect_time
+_TIME_PATTERNS = tuple((re.compile(pattern), time_type) for pattern, time_type in [
+    # Absolute dates
+    (r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})', 'absolute_date'),
+    (r'ngày (\d{1,2}) tháng (\d{1,2})', 'vietnamese_date'),
+    
+    # Relative dates
+    (r'ngày mai|tomorrow', 'tomorrow'),
+    (r'hôm nay|today', 'today'),
+    (r'tuần sau|next week', 'next_week'),
+    (r'cuối tuần này|this weekend', 'this_weekend'),
+    (r'tháng sau|next month', 'next_month'),
+    (r'(\d+) ngày nữa', 'days_from_now'),
+    (r'(\d+) tuần nữa', 'weeks_from_now'),
+])
+
+# dateparser configuration for Vietnamese queries, used when no pattern matches
+_DATEPARSER_LANGUAGES = ['vi', 'en']
+_DATEPARSER_SETTINGS = {
+    'DATE_ORDER': 'DMY',
+    'RETURN_AS_TIMEZONE_AWARE': False
+}
+
 def detect_time(query: str) -> Optional[Dict[str, Any]]:
     """
     Detect dates/time information from query.
@@ -143,13 +175,6 @@ def detect_time(query: str) -> Optional[Dict[str, Any]]:
     """
     query_lower = query.lower()
     
-    # Configure dateparser for Vietnamese
-    dateparser_languages = ['vi', 'en']
-    dateparser_settings = {
-        'DATE_ORDER': 'DMY',
-        'RETURN_AS_TIMEZONE_AWARE': False
-    }
-    
     time_info = {
         "has_dates": False,
         "start_date": None,
@@ -158,24 +183,8 @@ def detect_time(query: str) -> Optional[Dict[str, Any]]:
         "date_format": None
     }
     
-    # Common Vietnamese time expressions
-    time_patterns = [
-        # Absolute dates
-        (r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})', 'absolute_date'),
-        (r'ngày (\d{1,2}) tháng (\d{1,2})', 'vietnamese_date'),
-        
-        # Relative dates
-        (r'ngày mai|tomorrow', 'tomorrow'),
-        (r'hôm nay|today', 'today'),
-        (r'tuần sau|next week', 'next_week'),
-        (r'cuối tuần này|this weekend', 'this_weekend'),
-        (r'tháng sau|next month', 'next_month'),
-        (r'(\d+) ngày nữa', 'days_from_now'),
-        (r'(\d+) tuần nữa', 'weeks_from_now'),
-    ]
-    
-    for pattern, time_type in time_patterns:
-        match = re.search(pattern, query_lower)
+    for pattern, time_type in _TIME_PATTERNS:
+        match = pattern.search(query_lower)
         if match:
             time_info["has_dates"] = True
             time_info["date_format"] = time_type
@@ -226,8 +235,8 @@ def detect_time(query: str) -> Optional[Dict[str, Any]]:
     if not time_info["has_dates"]:
         parsed_date = dateparser.parse(
             query, 
-            languages=dateparser_languages, 
-            settings=dateparser_settings
+            languages=_DATEPARSER_LANGUAGES, 
+            settings=_DATEPARSER_SETTINGS
         )
         if parsed_date and parsed_date > datetime.now():
             time_info["has_dates"] = True
@@ -236,6 +245,84 @@ def detect_time(query: str) -> Optional[Dict[str, Any]]:
     
     return time_info if time_info["has_dates"] else None
 
+# Priority patterns - check these first for high-confidence matches
+_PRIORITY_PATTERNS = {
+    'weather': [
+        r'\bweather\b.*\bin\b',  # "weather in ..."
+        r'\bweather\b.*\btomorrow\b',  # "weather ... tomorrow"
+        r'\bweather\b.*\btoday\b',  # "weather ... today"
+        r'\bthời tiết\b',  # Vietnamese weather
+        r'\bdự báo\b',  # Vietnamese forecast
+        r'\bnhiệt độ\b',  # Vietnamese temperature
+        r'\bhow.*\bweather\b',  # "how is the weather"
+        r'\bwhat.*\bweather\b',  # "what is the weather"
+    ],
+    'book': [
+        r'\bbook.*\bhotel\b',
+        r'\bđặt.*\bkhách sạn\b',
+        r'\breservation\b',
+        r'\baccommodation\b',
+    ],
+    'eat': [
+        r'\bfood\b.*\brecommend\b',
+        r'\brestaurant\b.*\brecommend\b',
+        r'\bwhere.*\beat\b',
+        r'\bđặc sản\b',
+    ]
+}
+
+# One alternation per intent; the intents are still tried in order
+_PRIORITY_INTENT_RES = {
+    intent: re.compile("|".join(patterns))
+    for intent, patterns in _PRIORITY_PATTERNS.items()
+}
+
+# Intent keywords for scoring
+_INTENT_KEYWORDS = {
+    'eat': [
+        'ăn', 'món', 'quán', 'nhà hàng', 'food', 'eat', 'restaurant',
+        'đặc sản', 'ẩm thực', 'cuisine', 'dish', 'meal', 'breakfast',
+        'lunch', 'dinner', 'snack', 'drink', 'cafe', 'coffee',
+        'phở', 'bánh', 'bún', 'chả', 'nem'
+    ],
+    'visit': [
+        'thăm', 'tham quan', 'visit', 'see', 'go to', 'attraction',
+        'địa điểm', 'điểm', 'chỗ', 'place', 'location', 'destination',
+        'bảo tàng', 'museum', 'temple', 'chùa', 'pagoda', 'beach',
+        'bãi biển', 'núi', 'mountain', 'lake', 'hồ', 'park', 'công viên'
+    ],
+    'plan': [
+        'lịch trình', 'kế hoạch', 'plan', 'itinerary', 'schedule',
+        'tour', 'chuyến đi', 'trip', 'travel', 'du lịch',
+        'ngày', 'day', 'tuần', 'week', 'tháng', 'month'
+    ],
+    'book': [
+        'đặt', 'book', 'booking', 'reservation', 'hotel', 'khách sạn',
+        'homestay', 'resort', 'phòng', 'room', 'accommodation',
+        'lưu trú', 'nghỉ', 'stay'
+    ],
+    'weather': [
+        'weather', 'Weather', 'nhiệt độ', 'temperature', 'mưa', 'rain',
+        'nắng', 'sunny', 'sun', 'cloud', 'mây', 'gió', 'wind',
+        'ẩm ướt', 'humid', 'khô', 'dry', 'lạnh', 'cold', 'nóng', 'hot',
+        'dự báo', 'forecast', 'climate', 'khí hậu', 'như thế nào',
+        'ra sao', 'bao nhiêu độ', 'độ c', 'celsius', 'độ f', 'fahrenheit',
+        'mưa gió', 'stormy', 'bão', 'storm', 'nắng nóng', 'mát mẻ', 'cool',
+        'ấm áp', 'warm', 'se lạnh', 'chilly', 'băng giá', 'freezing',
+        'conditions', 'thời tiết', 'Thời tiết', 'dự báo thời tiết'
+    ]
+}
+
+# (keyword, word-bounded pattern) pairs; keywords of two characters or fewer
+# are matched as plain substrings, so they carry no pattern
+_INTENT_KEYWORD_RES = {
+    intent: [
+        (keyword, re.compile(r'\b' + re.escape(keyword) + r'\b') if len(keyword) > 2 else None)
+        for keyword in keywords
+    ]
+    for intent, keywords in _INTENT_KEYWORDS.items()
+}
+
 def classify_intent(query: str) -> str:
     """
     Classify user intent from query.
@@ -243,87 +330,21 @@ def classify_intent(query: str) -> str:
     """
     query_lower = query.lower()
     
-    # Priority patterns - check these first for high-confidence matches
-    priority_patterns = {
-        'weather': [
-            r'\bweather\b.*\bin\b',  # "weather in ..."
-            r'\bweather\b.*\btomorrow\b',  # "weather ... tomorrow"
-            r'\bweather\b.*\btoday\b',  # "weather ... today"
-            r'\bthời tiết\b',  # Vietnamese weather
-            r'\bdự báo\b',  # Vietnamese forecast
-            r'\bnhiệt độ\b',  # Vietnamese temperature
-            r'\bhow.*\bweather\b',  # "how is the weather"
-            r'\bwhat.*\bweather\b',  # "what is the weather"
-        ],
-        'book': [
-            r'\bbook.*\bhotel\b',
-            r'\bđặt.*\bkhách sạn\b',
-            r'\breservation\b',
-            r'\baccommodation\b',
-        ],
-        'eat': [
-            r'\bfood\b.*\brecommend\b',
-            r'\brestaurant\b.*\brecommend\b',
-            r'\bwhere.*\beat\b',
-            r'\bđặc sản\b',
-        ]
-    }
-    
     # Check priority patterns first
-    for intent, patterns in priority_patterns.items():
-        for pattern in patterns:
-            if re.search(pattern, query_lower):
-                return intent
-    
-    # Intent keywords for scoring
-    intent_keywords = {
-        'eat': [
-            'ăn', 'món', 'quán', 'nhà hàng', 'food', 'eat', 'restaurant',
-            'đặc sản', 'ẩm thực', 'cuisine', 'dish', 'meal', 'breakfast',
-            'lunch', 'dinner', 'snack', 'drink', 'cafe', 'coffee',
-            'phở', 'bánh', 'bún', 'chả', 'nem'
-        ],
-        'visit': [
-            'thăm', 'tham quan', 'visit', 'see', 'go to', 'attraction',
-            'địa điểm', 'điểm', 'chỗ', 'place', 'location', 'destination',
-            'bảo tàng', 'museum', 'temple', 'chùa', 'pagoda', 'beach',
-            'bãi biển', 'núi', 'mountain', 'lake', 'hồ', 'park', 'công viên'
-        ],
-        'plan': [
-            'lịch trình', 'kế hoạch', 'plan', 'itinerary', 'schedule',
-            'tour', 'chuyến đi', 'trip', 'travel', 'du lịch',
-            'ngày', 'day', 'tuần', 'week', 'tháng', 'month'
-        ],
-        'book': [
-            'đặt', 'book', 'booking', 'reservation', 'hotel', 'khách sạn',
-            'homestay', 'resort', 'phòng', 'room', 'accommodation',
-            'lưu trú', 'nghỉ', 'stay'
-        ],
-        'weather': [
-            'weather', 'Weather', 'nhiệt độ', 'temperature', 'mưa', 'rain',
-            'nắng', 'sunny', 'sun', 'cloud', 'mây', 'gió', 'wind',
-            'ẩm ướt', 'humid', 'khô', 'dry', 'lạnh', 'cold', 'nóng', 'hot',
-            'dự báo', 'forecast', 'climate', 'khí hậu', 'như thế nào',
-            'ra sao', 'bao nhiêu độ', 'độ c', 'celsius', 'độ f', 'fahrenheit',
-            'mưa gió', 'stormy', 'bão', 'storm', 'nắng nóng', 'mát mẻ', 'cool',
-            'ấm áp', 'warm', 'se lạnh', 'chilly', 'băng giá', 'freezing',
-            'conditions', 'thời tiết', 'Thời tiết', 'dự báo thời tiết'
-        ]
-    }
+    for intent, pattern in _PRIORITY_INTENT_RES.items():
+        if pattern.search(query_lower):
+            return intent
     
     # Count matches for each intent using word boundaries where possible
     intent_scores = {}
-    for intent, keywords in intent_keywords.items():
+    for intent, keywords in _INTENT_KEYWORD_RES.items():
         score = 0
-        for keyword in keywords:
-            # Use word boundaries for better matching
-            if len(keyword) > 2:
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                if re.search(pattern, query_lower):
-                    score += 1
-            else:
-                if keyword in query_lower:
+        for keyword, pattern in keywords:
+            if pattern is not None:
+                if pattern.search(query_lower):
                     score += 1
+            elif keyword in query_lower:
+                score += 1
         intent_scores[intent] = score
     
     # Find best match
@@ -337,35 +358,42 @@ def classify_intent(query: str) -> str:
     
     return best_intent
 
+# Preference keywords per category, in priority order: the first value whose
+# keywords appear anywhere in the query wins, one compiled scan per value
+_PREFERENCE_RES = tuple(
+    (key, tuple((value, re.compile("|".join(map(re.escape, words)))) for value, words in options))
+    for key, options in [
+        ('activity_type', [
+            ('cultural_historical', ['lịch sử', 'history', 'văn hóa', 'culture']),
+            ('nature_outdoor', ['thiên nhiên', 'nature', 'núi', 'mountain', 'biển', 'beach']),
+            ('relaxation', ['thư giãn', 'relax', 'nghỉ ngơi', 'rest']),
+            ('adventure_sports', ['phiêu lưu', 'adventure', 'thể thao', 'sport']),
+        ]),
+        ('food_type', [
+            ('traditional_local', ['truyền thống', 'traditional', 'đặc sản', 'local']),
+            ('street_food', ['đường phố', 'street food', 'bình dân']),
+            ('fine_dining', ['cao cấp', 'fine dining', 'sang trọng']),
+        ]),
+        ('budget', [
+            ('budget', ['rẻ', 'cheap', 'tiết kiệm', 'budget']),
+            ('luxury', ['cao cấp', 'luxury', 'sang trọng']),
+        ]),
+    ]
+)
+
+
 def extract_preferences(query: str) -> Dict[str, str]:
     """Extract user preferences from query"""
     preferences = {}
     query_lower = query.lower()
     
-    # Activity preferences
-    if any(word in query_lower for word in ['lịch sử', 'history', 'văn hóa', 'culture']):
-        preferences['activity_type'] = 'cultural_historical'
-    elif any(word in query_lower for word in ['thiên nhiên', 'nature', 'núi', 'mountain', 'biển', 'beach']):
-        preferences['activity_type'] = 'nature_outdoor'
-    elif any(word in query_lower for word in ['thư giãn', 'relax', 'nghỉ ngơi', 'rest']):
-        preferences['activity_type'] = 'relaxation'
-    elif any(word in query_lower for word in ['phiêu lưu', 'adventure', 'thể thao', 'sport']):
-        preferences['activity_type'] = 'adventure_sports'
-    
-    # Food preferences
-    if any(word in query_lower for word in ['truyền thống', 'traditional', 'đặc sản', 'local']):
-        preferences['food_type'] = 'traditional_local'
-    elif any(word in query_lower for word in ['đường phố', 'street food', 'bình dân']):
-        preferences['food_type'] = 'street_food'
-    elif any(word in query_lower for word in ['cao cấp', 'fine dining', 'sang trọng']):
-        preferences['food_type'] = 'fine_dining'
+    for key, options in _PREFERENCE_RES:
+        for value, pattern in options:
+            if pattern.search(query_lower):
+                preferences[key] = value
+                break
     
-    # Budget preferences
-    if any(word in query_lower for word in ['rẻ', 'cheap', 'tiết kiệm', 'budget']):
-        preferences['budget'] = 'budget'
-    elif any(word in query_lower for word in ['cao cấp', 'luxury', 'sang trọng']):
-        preferences['budget'] = 'luxury'
-    else:
-        preferences['budget'] = 'mid_range'
+    # Budget defaults to mid-range when the query says nothing about it
+    preferences.setdefault('budget', 'mid_range')
     
     return preferences
\ No newline at end of file
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Unit tests for BookingAgent budget extraction
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.booking_agent import BookingAgent
+
+
+def _extract_budget(request):
+    """Run BookingAgent._extract_budget without building the crewai Agent"""
+    agent = BookingAgent.__new__(BookingAgent)
+    return agent._extract_budget(request, {})
+
+
+def test_budget_keyword_wins_over_luxury():
+    """A request naming both ranges is budget, whichever keyword comes first"""
+    assert _extract_budget("khách sạn cao cấp nhưng giá rẻ") == "budget"
+    assert _extract_budget("phòng giá rẻ nhưng sang trọng") == "budget"
+
+
+def test_single_range_keywords():
+    """Each keyword list still maps to its own range"""
+    assert _extract_budget("resort sang trọng ở đà nẵng") == "luxury"
+    assert _extract_budget("khách sạn 5 sao ở hà nội") == "luxury"
+    assert _extract_budget("nhà nghỉ bình dân ở hội an") == "budget"
+    assert _extract_budget("cheap hostel in hanoi") == "budget"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
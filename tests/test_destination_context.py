@@ -62,7 +62,7 @@ def test_destination_context_issue():
     # Get context from memory agent
     context2 = memory_agent.get_relevant_context(query2, intent2)
     print(f"   Memory context: {context2}")
-    print(f"   Current destination from memory: {memory_agent.user_context.get('current_destination')}")
+    print(f"   Current destination from memory: {memory_agent.user_context.current_destination}")
     
     # Test individual components
     print("\n" + "-"*50)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the embedding-keyed SemanticCache
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.semantic_cache import SemanticCache
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for OpenAIEmbeddings: one axis per known query"""
+
+    VECTORS = {
+        "quán phở ngon ở hà nội": [1.0, 0.0, 0.0],
+        "quán phở ngon tại hà nội": [0.99, 0.1, 0.0],
+        "địa điểm tham quan đà nẵng": [0.0, 1.0, 0.0],
+        "khách sạn ở hội an": [0.0, 0.0, 1.0],
+    }
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, query):
+        self.calls += 1
+        return list(self.VECTORS[query])
+
+
+def test_get_put_by_similarity_and_scope():
+    """A near-duplicate query hits in the same scope and misses in another"""
+    cache = SemanticCache(FakeEmbedder(), threshold=0.95)
+    assert cache.get("quán phở ngon ở hà nội", "eat|hà nội") is None
+
+    cache.put("quán phở ngon ở hà nội", "eat|hà nội", "phở Bát Đàn")
+
+    assert cache.get("quán phở ngon tại hà nội", "eat|hà nội") == "phở Bát Đàn"
+    assert cache.get("quán phở ngon tại hà nội", "eat|đà nẵng") is None
+    assert cache.get("địa điểm tham quan đà nẵng", "eat|hà nội") is None
+
+
+def test_get_then_put_reuses_embedding():
+    """put() right after a missed get() for the same query embeds only once"""
+    embedder = FakeEmbedder()
+    cache = SemanticCache(embedder)
+    cache.put("khách sạn ở hội an", "book|hội an", "seed")
+
+    assert cache.get("địa điểm tham quan đà nẵng", "visit|đà nẵng") is None
+    cache.put("địa điểm tham quan đà nẵng", "visit|đà nẵng", "Bà Nà Hills")
+
+    assert embedder.calls == 2
+
+
+def test_ring_overwrites_oldest_entry():
+    """Once max_entries is reached the oldest row is replaced first"""
+    cache = SemanticCache(FakeEmbedder(), max_entries=2)
+    cache.put("quán phở ngon ở hà nội", "eat", "phở")
+    cache.put("địa điểm tham quan đà nẵng", "visit", "Bà Nà Hills")
+    cache.put("khách sạn ở hội an", "book", "Anantara")
+
+    assert cache.get("quán phở ngon ở hà nội", "eat") is None
+    assert cache.get("địa điểm tham quan đà nẵng", "visit") == "Bà Nà Hills"
+    assert cache.get("khách sạn ở hội an", "book") == "Anantara"
+    assert len(cache._responses) == 2
+
+
+def test_expired_entries_are_skipped():
+    """Entries older than ttl are ignored by get()"""
+    cache = SemanticCache(FakeEmbedder(), ttl=60)
+    cache.put("quán phở ngon ở hà nội", "eat", "phở")
+    assert cache.get("quán phở ngon ở hà nội", "eat") == "phở"
+
+    cache._stamps[0] -= 120
+    assert cache.get("quán phở ngon ở hà nội", "eat") is None
+
+
+def test_save_load_round_trip():
+    """A saved cache answers the same lookups after load(), ring position included"""
+    cache = SemanticCache(FakeEmbedder(), max_entries=2)
+    cache.put("quán phở ngon ở hà nội", "eat", "phở")
+    cache.put("địa điểm tham quan đà nẵng", "visit", "Bà Nà Hills")
+    cache.put("khách sạn ở hội an", "book", "Anantara")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache", "responses")
+        cache.save(path)
+
+        restored = SemanticCache(FakeEmbedder(), max_entries=2)
+        restored.load(path)
+
+    assert restored.get("địa điểm tham quan đà nẵng", "visit") == "Bà Nà Hills"
+    assert restored.get("khách sạn ở hội an", "book") == "Anantara"
+    assert restored._next == cache._next
+
+    # The next put continues the ring where the saved cache left off
+    restored.put("quán phở ngon ở hà nội", "eat", "phở")
+    assert restored.get("địa điểm tham quan đà nẵng", "visit") is None
+    assert restored.get("khách sạn ở hội an", "book") == "Anantara"
+
+
+def test_load_missing_file_leaves_cache_empty():
+    """load() on a path that was never saved is a no-op"""
+    cache = SemanticCache(FakeEmbedder())
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.load(os.path.join(tmp, "missing"))
+    assert cache.get("khách sạn ở hội an", "book") is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
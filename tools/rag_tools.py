@@ -1,8 +1,11 @@
 from pydantic import BaseModel, Field, ConfigDict
 from crewai.tools import BaseTool
 from tools.vector_store import TravelRAGSystem
-from tools.utils_tool import RealtimeWeatherTool, WeatherRecommendationTool
-from typing import Any
+from tools.utils_tool import RealtimeWeatherTool, RealtimeWeatherBatchTool, WeatherRecommendationTool
+from data.travel_data import TRAVEL_DATA
+from core.config import settings
+from typing import Any, List, Optional, Tuple
+from functools import lru_cache
 
 class LocationSearchInput(BaseModel):
     query: str = Field(..., description="Search query about locations")
@@ -87,4 +90,18 @@ class TravelRAGTools:
         self.tips_search = TipsSearchTool(rag_system=rag_system)
         self.general_search = GeneralSearchTool(rag_system=rag_system)
         self.weather_search = RealtimeWeatherTool()  # Add real-time weather tool
-        self.weather_recommendation = WeatherRecommendationTool()  # Add weather recommendation tool
\ No newline at end of file
+        self.weather_search_batch = RealtimeWeatherBatchTool()  # All hourly slots of a day in one call
+        self.weather_recommendation = WeatherRecommendationTool()  # Add weather recommendation tool
+
+    def batch_search(self, searches: List[Tuple[str, str, Optional[str]]]) -> List[str]:
+        """Run several (doc_type, query, destination) RAG searches with one embedding call"""
+        return self.rag_system.search_batch(searches)
+
+
+@lru_cache(maxsize=1)
+def shared_rag_tools() -> TravelRAGTools:
+    """Process-wide RAG system and tools, built on first use and shared by every orchestrator"""
+    rag_system = TravelRAGSystem(settings["rag_config"], settings["chroma_path"], TRAVEL_DATA)
+    # Open Chroma in the background; only queries that search RAG wait for it
+    rag_system.setup_vectorstore_async(force_rebuild=False)
+    return TravelRAGTools(rag_system)
@@ -1,13 +1,36 @@
 import requests
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Any, Optional
+from typing import Any, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# (connect, read) timeout for WeatherAPI.com calls, so a slow DNS lookup or
+# handshake can't eat the whole read budget
+_WEATHER_TIMEOUT = (3, 10)
+
+
+def _build_session() -> requests.Session:
+    """Keep-alive WeatherAPI.com session that retries transient gateway errors"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                          allowed_methods=frozenset(["GET"]))
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by every RealtimeWeatherTool; itineraries fire several lookups per day
+_SESSION = _build_session()
+
 class WeatherSearchInput(BaseModel):
     city: str = Field(..., description="The city name for weather forecast (e.g., 'Hanoi', 'Sa Pa', 'Hoi An')")
     days: int = Field(default=1, description="Number of days for forecast (1-14 days). Default is 1 for current weather.")
@@ -51,7 +74,7 @@ class RealtimeWeatherTool(BaseTool):
         """Get current weather for the city using WeatherAPI.com"""
         url = f"http://api.weatherapi.com/v1/current.json?key={self.api_key}&q={city}&aqi=yes"
         
-        response = requests.get(url)
+        response = _SESSION.get(url, timeout=_WEATHER_TIMEOUT)
         if response.status_code != 200:
             return f"Error: Could not fetch weather data for {city}. Status code: {response.status_code}"
         
@@ -102,15 +125,19 @@ class RealtimeWeatherTool(BaseTool):
 
     def _get_hourly_weather(self, city: str, hour: int, date: Optional[str] = None) -> str:
         """Get hourly weather forecast for specific hour"""
+        return self._get_hours_weather(city, [hour], date)[0]
+
+    def _get_hours_weather(self, city: str, hours: List[int], date: Optional[str] = None) -> List[str]:
+        """Hourly forecasts for several hours of one day from a single API call"""
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
         
         # For hourly forecast, we need at least 1 day forecast
         url = f"http://api.weatherapi.com/v1/forecast.json?key={self.api_key}&q={city}&days=3&aqi=yes"
         
-        response = requests.get(url)
+        response = _SESSION.get(url, timeout=_WEATHER_TIMEOUT)
         if response.status_code != 200:
-            return f"Error: Could not fetch hourly weather data for {city}. Status code: {response.status_code}"
+            return [f"Error: Could not fetch hourly weather data for {city}. Status code: {response.status_code}"] * len(hours)
         
         data = response.json()
         location = data["location"]
@@ -124,8 +151,12 @@ class RealtimeWeatherTool(BaseTool):
                 break
         
         if not target_day:
-            return f"Error: No hourly data available for {date}"
+            return [f"Error: No hourly data available for {date}"] * len(hours)
         
+        return [self._format_hourly_weather(location, target_day, hour, date) for hour in hours]
+
+    def _format_hourly_weather(self, location: dict, target_day: dict, hour: int, date: str) -> str:
+        """Format one hour of a WeatherAPI.com forecast day"""
         # Find the specific hour
         target_hour = None
         for hour_data in target_day["hour"]:
@@ -181,7 +212,7 @@ class RealtimeWeatherTool(BaseTool):
         url = f"http://api.weatherapi.com/v1/forecast.json?key={self.api_key}&q={city}&days={days}&aqi=yes&alerts=yes"
         
                 
-        response = requests.get(url)
+        response = _SESSION.get(url, timeout=_WEATHER_TIMEOUT)
         if response.status_code != 200:
             return f"Error: Could not fetch forecast data for {city}. Status code: {response.status_code}"
         
@@ -327,7 +358,6 @@ class RealtimeWeatherTool(BaseTool):
         """Generate recommendations for forecast day"""
         temp_min = day_info['mintemp_c']
         temp_max = day_info['maxtemp_c']
-        temp_avg = (temp_min + temp_max) / 2
         description = day_info['condition']['text'].lower()
         rain_chance = day_info.get('daily_chance_of_rain', 0)
         snow_chance = day_info.get('daily_chance_of_snow', 0)
@@ -380,10 +410,12 @@ class RealtimeWeatherTool(BaseTool):
             ("Tối", 20)
         ]
         
-        results = []
-        for period_name, hour in periods:
-            weather_data = self._get_hourly_weather(city, hour, date)
-            results.append(f"\n=== {period_name.upper()} ({hour:02d}:00) ===\n{weather_data}")
+        # One forecast request covers all four periods
+        hourly = self._get_hours_weather(city, [hour for _, hour in periods], date)
+        results = [
+            f"\n=== {period_name.upper()} ({hour:02d}:00) ===\n{weather_data}"
+            for (period_name, hour), weather_data in zip(periods, hourly)
+        ]
         
         return "\n".join(results)
 
@@ -394,6 +426,35 @@ class RealtimeWeatherTool(BaseTool):
         
         return f"{current_weather}\n\n📊 TODAY'S DETAILED SCHEDULE:\n{time_periods}"
 
+class WeatherBatchInput(BaseModel):
+    city: str = Field(..., description="The city name for weather forecast (e.g., 'Hanoi', 'Sa Pa', 'Hoi An')")
+    date: Optional[str] = Field(default=None, description="Date for the forecast (YYYY-MM-DD format). Optional - defaults to today.")
+    hours: List[int] = Field(default=[8, 12, 16, 20], description="Hours of the day (0-23) to forecast. Default is the 4 itinerary slots: 8, 12, 16, 20.")
+
+class RealtimeWeatherBatchTool(BaseTool):
+    name: str = "realtime_weather_batch"
+    description: str = "Get hourly weather for several hours of one day in a single call using WeatherAPI.com. Use instead of calling realtime_weather once per hour."
+    args_schema: type[BaseModel] = WeatherBatchInput
+    
+    model_config = ConfigDict(extra='allow')
+    
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        self.weather_tool = RealtimeWeatherTool()
+
+    def _run(self, city: str, date: Optional[str] = None, hours: Optional[List[int]] = None) -> str:
+        """Fetch the day's forecast once and report each requested hour"""
+        if not self.weather_tool.api_key:
+            return "Error: WeatherAPI.com API key not configured. Please set WEATHERAPI_KEY environment variable."
+        
+        hours = hours or [8, 12, 16, 20]
+        try:
+            hourly = self.weather_tool._get_hours_weather(city, hours, date)
+        except Exception as e:
+            return f"Error fetching weather data: {str(e)}"
+        
+        return "\n\n".join(f"=== {hour:02d}:00 ===\n{weather_data}" for hour, weather_data in zip(hours, hourly))
+
 class WeatherRecommendationInput(BaseModel):
     destination: str = Field(..., description="Destination city")
     date: str = Field(..., description="Date in YYYY-MM-DD format")
@@ -2,13 +2,21 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from typing import List
+from typing import List, Optional, Tuple
+from threading import Thread
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
+# Query prefixes per document type: (with destination, without destination)
+_SEARCH_PREFIXES = {
+    "location": ("địa điểm {destination} {query}", "địa điểm {query}"),
+    "food": ("món ăn {destination} {query}", "món ăn ẩm thực {query}"),
+    "tips": ("lời khuyên {destination} {query}", "lời khuyên {query}"),
+}
+
 
 # ===== RAG SYSTEM =====
 class TravelRAGSystem:
@@ -26,6 +34,11 @@ class TravelRAGSystem:
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
         )
         self.vectorstore = None
+        # Lowercase destination name -> TRAVEL_DATA key stored as "dest_key"
+        # metadata, so canonical names from detect_destination match documents
+        self._dest_keys = {data['name'].lower(): key for key, data in travel_data.items()}
+        # Background setup started by setup_vectorstore_async, if any
+        self._setup_thread: Optional[Thread] = None
 
     def setup_vectorstore(self, force_rebuild: bool = False):
         """Setup or load vector store"""
@@ -51,6 +64,22 @@ class TravelRAGSystem:
             )
             print("✅ Vector database loaded successfully")
 
+    def setup_vectorstore_async(self, force_rebuild: bool = False):
+        """Setup or load vector store in a background thread; searches wait for it"""
+        def setup():
+            try:
+                self.setup_vectorstore(force_rebuild)
+            except Exception as e:
+                print(f"❌ Vector database setup failed: {e}")
+
+        self._setup_thread = Thread(target=setup, daemon=True)
+        self._setup_thread.start()
+
+    def _wait_for_vectorstore(self):
+        """Block until a background setup, if one was started, has finished"""
+        if self._setup_thread is not None:
+            self._setup_thread.join()
+
     def _prepare_documents(self) -> List[Document]:
         """Convert travel data to documents"""
         documents = []
@@ -109,6 +138,7 @@ Mã định danh: {dest_key}
 
     def search_locations(self, query: str, destination: str = None) -> str:
         """Search for location information"""
+        self._wait_for_vectorstore()
         if not self.vectorstore:
             return "Vector store not initialized"
 
@@ -132,6 +162,7 @@ Mã định danh: {dest_key}
 
     def search_food(self, query: str, destination: str = None) -> str:
         """Search for food information"""
+        self._wait_for_vectorstore()
         if not self.vectorstore:
             return "Vector store not initialized"
 
@@ -155,6 +186,7 @@ Mã định danh: {dest_key}
 
     def search_tips(self, query: str, destination: str = None) -> str:
         """Search for travel tips"""
+        self._wait_for_vectorstore()
         if not self.vectorstore:
             return "Vector store not initialized"
 
@@ -178,6 +210,7 @@ Mã định danh: {dest_key}
 
     def search_general(self, query: str, destination: str = None) -> str:
         """General search across all content"""
+        self._wait_for_vectorstore()
         if not self.vectorstore:
             return "Vector store not initialized"
 
@@ -192,4 +225,47 @@ Mã định danh: {dest_key}
             k=self.config['top_k'],
             filter=filter_dict
         )
-        return "\n".join([doc.page_content for doc in docs])
\ No newline at end of file
+        return "\n".join([doc.page_content for doc in docs])
+
+    def _destination_filter(self, destination: str) -> dict:
+        """Metadata filter for a destination given in any letter case"""
+        dest_key = self._dest_keys.get(destination.lower())
+        return {"dest_key": dest_key} if dest_key else {"destination": destination}
+
+    def search_batch(self, searches: List[Tuple[str, str, Optional[str]]]) -> List[str]:
+        """
+        Run several (doc_type, query, destination) searches with one embedding call.
+        doc_type is "location", "food", "tips" or "general"; each result matches
+        the corresponding search_* method.
+        """
+        self._wait_for_vectorstore()
+        if not self.vectorstore:
+            return ["Vector store not initialized"] * len(searches)
+        if not searches:
+            return []
+
+        search_queries = []
+        filters = []
+        for doc_type, query, destination in searches:
+            if doc_type == "general":
+                search_queries.append(query)
+                filters.append(self._destination_filter(destination) if destination else None)
+                continue
+            with_dest, without_dest = _SEARCH_PREFIXES[doc_type]
+            template = with_dest if destination else without_dest
+            search_queries.append(template.format(destination=destination, query=query))
+            if destination:
+                filters.append({"$and": [{"type": doc_type}, self._destination_filter(destination)]})
+            else:
+                filters.append({"type": doc_type})
+
+        vectors = self.embeddings.embed_documents(search_queries)
+        results = []
+        for vector, filter_dict in zip(vectors, filters):
+            docs = self.vectorstore.similarity_search_by_vector(
+                vector,
+                k=self.config['top_k'],
+                filter=filter_dict
+            )
+            results.append("\n".join([doc.page_content for doc in docs]))
+        return results
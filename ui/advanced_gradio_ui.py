@@ -19,6 +19,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 try:
     from agents.multi_agent_orchestrator import MultiAgentTravelOrchestrator
     from core.utils import classify_intent, detect_destination, detect_trip_length
+    from core.config import setup_logging
 except ImportError as e:
     print(f"Import error: {e}")
     sys.exit(1)
@@ -426,6 +427,7 @@ def create_advanced_interface():
 def main():
     """Launch the advanced interface"""
     print("🚀 Starting Advanced Travel Chatbot UI...")
+    setup_logging()
     
     try:
         demo = create_advanced_interface()
@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 try:
     from agents.multi_agent_orchestrator import MultiAgentTravelOrchestrator
     from core.utils import classify_intent
+    from core.config import setup_logging
 except ImportError as e:
     print(f"Import error: {e}")
     print("Please make sure all dependencies are installed and the project structure is correct.")
@@ -361,6 +362,7 @@ def create_chatbot_interface():
 def main():
     """Main function to launch the Gradio interface"""
     print("🚀 Starting Gradio Chatbot UI...")
+    setup_logging()
     
     try:
         # Create and launch the interface